@@ -1,37 +1,184 @@
-import argparse
-import email.mime.application
-import email.mime.multipart
-import email.mime.text
+import csv
+import hashlib
+import io
 import json
 import logging
 import os
-import sys
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 
 import boto3
-import botocore.session
-from botocore.stub import Stubber
+from botocore.config import Config
 
 from mapper_factory import MapperFactory
 from soc2_mapper import SOC2Mapper
+from utils import (
+    RateLimiter,
+    format_severity,
+    get_env_number,
+    json_dumps,
+    json_loads,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Upper bound on concurrent SES sends when reporting to several recipients
+SES_MAX_WORKERS = 10
+
+# Other clients retry only transient errors (throttling, timeouts, 5xx), with a
+# bounded number of attempts, so a persistent failure surfaces quickly
+CLIENT_CONFIG = Config(retries={"max_attempts": 3, "mode": "standard"})
+
+# SES clients back off adaptively on throttling, and sends are paced client-side
+# to stay under the account's send rate (14/s by default in production); a rate
+# of 0 or less turns the pacing off
+SES_CLIENT_CONFIG = Config(
+    retries={"max_attempts": 8, "mode": "adaptive"},
+    tcp_keepalive=True,
+    max_pool_connections=SES_MAX_WORKERS,
+)
+SES_MAX_SEND_RATE = get_env_number("SES_MAX_SEND_RATE", 12.0, float)
+ses_rate_limiter = RateLimiter(SES_MAX_SEND_RATE)
+# The test email never varies, so its body is a constant
+TEST_EMAIL_BODY = (
+    "This is a test email from the AWS Security Hub Compliance Analyzer.\n\n"
+    "If you received this email, your SES configuration is working correctly."
+)
+
+# Bedrock model and prompt scaffolding. All frameworks are analyzed in a single
+# request, with one section per framework introduced by a marker line.
+BEDROCK_MODEL_ID = "anthropic.claude-v2"
+BEDROCK_MAX_TOKENS_PER_FRAMEWORK = 1000
+# Set to "optimized" for latency-optimized inference where the model and region
+# support it; unset keeps Bedrock's standard latency
+BEDROCK_LATENCY = os.environ.get("BEDROCK_LATENCY")
+# Set to "true" to put a prompt cache point after the system prompt, for models
+# that support Bedrock prompt caching
+BEDROCK_PROMPT_CACHING = os.environ.get("BEDROCK_PROMPT_CACHING", "").lower() == "true"
+# Static part of every Converse inference config; only the token budget varies
+BEDROCK_INFERENCE_CONFIG = {"temperature": 0.7, "topP": 0.9}
+BEDROCK_SECTION_MARKER = "### {framework_id}"
+# The instructions are the same for every request, so they form the system prompt
+# ahead of the findings, where they can be served from the prompt cache
+BEDROCK_SYSTEM_PROMPT = (
+    "You analyze AWS Security Hub findings for compliance frameworks. The user "
+    "message lists the findings for each framework in its own section, introduced "
+    "by a heading line. For each framework, provide a concise analysis of the "
+    "security posture, key risks, and recommendations. Start each framework's "
+    "analysis with its heading line exactly as given."
+)
+# Frameworks without a finding at or above this severity are left out of the
+# Bedrock request, so a quiet day with no critical or high findings skips Bedrock
+# entirely; "INFORMATIONAL" analyzes every framework with findings
+BEDROCK_MIN_SEVERITY = os.environ.get("BEDROCK_MIN_SEVERITY", "HIGH")
+SEVERITY_LEVELS = ("critical", "high", "medium", "low", "informational")
+# Noted in a framework's analysis when it is left out of the Bedrock request, so a
+# skipped AI analysis can be told apart from a failed one
+BEDROCK_SKIPPED_NOTE = (
+    "No findings at or above {severity} severity; AI analysis skipped.\n"
+)
+# Mapped finding fields left out of the prompt; descriptions are long boilerplate
+# that largely restates the title, so they add tokens without adding insight
+BEDROCK_PROMPT_OMITTED_FIELDS = frozenset({"Description"})
+
+# Only findings in these workflow states are requested, so suppressed and resolved
+# findings are dropped by Security Hub instead of being paged back and ignored
+FINDINGS_WORKFLOW_STATUSES = ("NEW", "NOTIFIED")
+
+# boto3 clients and framework mappers are cached at module scope so that warm
+# Lambda invocations reuse them, along with their HTTPS connection pools. Clients
+# are created under a lock, since creating them from boto3's default session is
+# not thread-safe and the first SES client is requested from the send threads.
+_clients = {}
+_clients_lock = threading.Lock()
+# The mappers are kept together with the frameworks configuration they were built
+# from, as a (frameworks, mappers) pair
+_mappers = None
+
+# The frameworks configuration rarely changes, so it is cached for a while
+FRAMEWORKS_CACHE_TTL = get_env_number("FRAMEWORKS_CACHE_TTL", 300)
+_frameworks_cache = {"value": None, "ts": 0}
+
+# Scheduled reruns often see the same findings, which produce the same request,
+# so Bedrock analyses are cached by a hash of the request body
+BEDROCK_CACHE_TTL = get_env_number("BEDROCK_CACHE_TTL", 86400)
+BEDROCK_CACHE_MAX_ENTRIES = 16
+_analysis_cache = {}
+
+
+def get_client(service_name, config=None):
+    """
+    Get a boto3 client for a service, creating it on first use.
+
+    Args:
+        service_name (str): AWS service name (e.g., 'securityhub', 'ses')
+        config (botocore.config.Config, optional): Client config used on creation,
+            CLIENT_CONFIG if not given
+
+    Returns:
+        object: The cached boto3 client
+    """
+    client = _clients.get(service_name)
+    if client is None:
+        with _clients_lock:
+            # Another thread may have created the client while this one waited
+            client = _clients.get(service_name)
+            if client is None:
+                client = _clients[service_name] = boto3.client(
+                    service_name, config=config or CLIENT_CONFIG
+                )
+    return client
+
+
+def get_mappers():
+    """
+    Get the framework mappers, creating them on first use.
+
+    The mappers are rebuilt whenever the frameworks configuration is reloaded with
+    different contents, after refresh_config or once FRAMEWORKS_CACHE_TTL expires,
+    so added frameworks get a mapper and removed ones lose theirs.
+
+    Returns:
+        dict: Dictionary of framework mappers keyed by framework ID
+    """
+    global _mappers
+    frameworks = load_frameworks()
+    if _mappers is None or _mappers[0] != frameworks:
+        if _mappers is not None:
+            logger.info("Frameworks configuration changed, rebuilding mappers")
+        _mappers = (frameworks, MapperFactory.create_all_mappers(frameworks))
+    return _mappers[1]
+
 
 def load_frameworks():
     """
     Load the compliance frameworks configuration.
 
+    The configuration is cached for FRAMEWORKS_CACHE_TTL seconds so that warm
+    invocations do not re-read it.
+
     Returns:
         list: List of framework configurations
     """
+    now = time.monotonic()
+    if (
+        _frameworks_cache["value"] is not None
+        and now - _frameworks_cache["ts"] < FRAMEWORKS_CACHE_TTL
+    ):
+        return _frameworks_cache["value"]
+
     try:
         with open("config/frameworks.json", "r") as f:
-            return json.load(f)
+            frameworks = json_loads(f.read())
+        _frameworks_cache.update(value=frameworks, ts=now)
+        return frameworks
     except Exception as e:
-        logger.error(f"Error loading frameworks: {e}")
+        logger.error("Error loading frameworks: %s", e)
         # Return default frameworks if file not found
         return [
             {
@@ -49,6 +196,25 @@ def load_frameworks():
         ]
 
 
+def iter_findings(securityhub, filters):
+    """
+    Yield findings from AWS Security Hub one page at a time.
+
+    The boto3 paginator fetches each page only as the previous one is consumed.
+
+    Args:
+        securityhub (object): Security Hub boto3 client
+        filters (dict): Security Hub finding filters
+
+    Yields:
+        dict: Security Hub findings matching the filters
+    """
+    paginator = securityhub.get_paginator("get_findings")
+    pages = paginator.paginate(Filters=filters, PaginationConfig={"PageSize": 100})
+    for page in pages:
+        yield from page.get("Findings", [])
+
+
 def get_findings(hours, framework_id=None):
     """Get findings from AWS Security Hub for the specified time period.
 
@@ -69,7 +235,7 @@ def get_findings(hours, framework_id=None):
             findings_by_framework[framework["id"]] = []
 
         # Create Security Hub client
-        securityhub = boto3.client("securityhub")
+        securityhub = get_client("securityhub")
 
         # Calculate time filter
         now = datetime.now(timezone.utc)
@@ -84,13 +250,17 @@ def get_findings(hours, framework_id=None):
                 }
             ],
             "RecordState": [{"Value": "ACTIVE", "Comparison": "EQUALS"}],
+            "WorkflowStatus": [
+                {"Value": status, "Comparison": "EQUALS"}
+                for status in FINDINGS_WORKFLOW_STATUSES
+            ],
         }
 
         # Add framework filter if specified
         if framework_id:
             # Check if framework is valid
             if framework_id not in findings_by_framework:
-                logger.warning(f"Invalid framework ID: {framework_id}")
+                logger.warning("Invalid framework ID: %s", framework_id)
                 return {}
 
             # Get framework ARN
@@ -102,29 +272,10 @@ def get_findings(hours, framework_id=None):
                     {"Value": framework_arn, "Comparison": "EQUALS"}
                 ]
 
-        # Get findings from Security Hub with pagination
-        findings = []
-        next_token = None
-
-        while True:
-            # Prepare parameters for API call
-            params = {"Filters": filters, "MaxResults": 100}
-            if next_token:
-                params["NextToken"] = next_token
-
-            # Call the API
-            response = securityhub.get_findings(**params)
-            findings.extend(response.get("Findings", []))
-
-            # Check if there are more pages
-            next_token = response.get("NextToken")
-            if not next_token:
-                break
-
-        logger.info(f"Retrieved {len(findings)} findings from Security Hub")
-
-        # Process findings
-        for finding in findings:
+        # Process findings as each page arrives rather than collecting them first
+        finding_count = 0
+        for finding in iter_findings(securityhub, filters):
+            finding_count += 1
             # Determine which framework this finding belongs to
             for framework in frameworks:
                 # Check if finding is related to this framework
@@ -139,6 +290,8 @@ def get_findings(hours, framework_id=None):
                 else:
                     findings_by_framework[framework["id"]].append(finding)
 
+        logger.info("Retrieved %d findings from Security Hub", finding_count)
+
         # If a specific framework was requested, return only those findings
         if framework_id:
             return findings_by_framework[framework_id]
@@ -146,7 +299,7 @@ def get_findings(hours, framework_id=None):
         return findings_by_framework
 
     except Exception as e:
-        logger.error(f"Error getting findings: {e}")
+        logger.error("Error getting findings: %s", e)
         # Return empty dictionary if there was an error
         if framework_id:
             return []
@@ -158,21 +311,92 @@ def get_findings(hours, framework_id=None):
         return empty_findings
 
 
-def analyze_findings(findings, mappers):
+def map_findings(findings, mappers):
+    """
+    Map each framework's findings to its controls once, for reuse by every report.
+
+    Args:
+        findings (dict or list): Dictionary of findings by framework or list of findings
+        mappers (dict): Dictionary of framework mappers
+
+    Returns:
+        dict: Mapped findings by framework ID
+    """
+    if isinstance(findings, list):
+        return {
+            framework_id: mapper.map_findings(findings)
+            for framework_id, mapper in mappers.items()
+        }
+    return {
+        framework_id: mapper.map_findings(findings[framework_id])
+        for framework_id, mapper in mappers.items()
+        if framework_id in findings
+    }
+
+
+def map_report_findings(findings, mappers):
+    """
+    Map findings once for both the CSV report and the analysis.
+
+    The CSV report lists every finding under every framework, while the analysis
+    covers each framework's own findings. Each mapper therefore maps the flattened
+    findings once, and each framework's own findings are sliced from the result.
+
+    Args:
+        findings (dict or list): Dictionary of findings by framework or list of findings
+        mappers (dict): Dictionary of framework mappers
+
+    Returns:
+        tuple: (all_findings, report_mapped_findings, analysis_mapped_findings) where
+               all_findings is the flattened list, report_mapped_findings maps it by
+               framework for the CSV and analysis_mapped_findings holds each
+               framework's own mapped findings
+    """
+    if not isinstance(findings, dict):
+        mapped_findings = map_findings(findings, mappers)
+        return findings, mapped_findings, mapped_findings
+
+    # Flatten the findings, remembering where each framework's findings sit
+    all_findings = []
+    spans = {}
+    for framework_id, framework_findings in findings.items():
+        start = len(all_findings)
+        all_findings.extend(framework_findings)
+        spans[framework_id] = (start, len(all_findings))
+
+    report_mapped_findings = map_findings(all_findings, mappers)
+    analysis_mapped_findings = {
+        framework_id: report_mapped_findings[framework_id][start:end]
+        for framework_id, (start, end) in spans.items()
+        if framework_id in report_mapped_findings
+    }
+    return all_findings, report_mapped_findings, analysis_mapped_findings
+
+
+def analyze_findings(findings, mappers, mapped_findings=None):
     """
     Analyze findings for compliance frameworks.
 
     Args:
         findings (dict or list): Dictionary of findings by framework or list of findings
         mappers (dict): Dictionary of framework mappers
+        mapped_findings (dict, optional): Findings already mapped by map_findings(),
+            used instead of mapping them again
 
     Returns:
         tuple: (analyses, stats) where analyses is a dictionary of analysis results by framework
                and stats is a dictionary of statistics by framework
     """
+    # Severity levels that qualify a framework for the Bedrock request
+    min_severity = BEDROCK_MIN_SEVERITY.lower()
+    if min_severity not in SEVERITY_LEVELS:
+        min_severity = "informational"
+    bedrock_severities = SEVERITY_LEVELS[: SEVERITY_LEVELS.index(min_severity) + 1]
+
     # Initialize results
     analyses = {}
     stats = {}
+    mapped_findings_by_framework = {}
 
     # Convert findings to dictionary if it's a list
     if isinstance(findings, list):
@@ -207,15 +431,15 @@ def analyze_findings(findings, mappers):
             }
             continue
 
-        # Map findings to framework controls
-        mapped_findings = []
-        for finding in framework_findings:
-            mapped_finding = mapper.map_finding(finding)
-            mapped_findings.append(mapped_finding)
+        # Map findings to framework controls in one batch, unless already mapped
+        if mapped_findings is not None and framework_id in mapped_findings:
+            framework_mapped_findings = mapped_findings[framework_id]
+        else:
+            framework_mapped_findings = mapper.map_findings(framework_findings)
 
         # Calculate statistics
         framework_stats = {
-            "total": len(mapped_findings),
+            "total": len(framework_findings),
             "by_severity": {
                 "critical": 0,
                 "high": 0,
@@ -226,94 +450,226 @@ def analyze_findings(findings, mappers):
             "by_control": {},
         }
 
-        # Process mapped findings
         control_id_attr = mapper.get_control_id_attribute()
-        for finding in mapped_findings:
+        by_severity = framework_stats["by_severity"]
+        by_control = framework_stats["by_control"]
+        for mapped_finding in framework_mapped_findings:
             # Count by severity
-            severity = finding.get("Severity", "INFORMATIONAL").lower()
-            if severity in framework_stats["by_severity"]:
-                framework_stats["by_severity"][severity] += 1
-
-            # Count by control
-            controls = finding.get(control_id_attr, [])
-            for control in controls:
-                if control not in framework_stats["by_control"]:
-                    framework_stats["by_control"][control] = {
-                        "count": 0,
-                        "findings": [],
-                    }
-                framework_stats["by_control"][control]["count"] += 1
-                framework_stats["by_control"][control]["findings"].append(finding)
-
-        # Generate analysis text
-        analysis_text = f"Analysis for {framework_id} Framework:\n\n"
-        analysis_text += f"Total findings: {framework_stats['total']}\n"
-        analysis_text += "Findings by severity:\n"
-        for severity, count in framework_stats["by_severity"].items():
-            analysis_text += f"  {severity.upper()}: {count}\n"
-
-        analysis_text += "\nFindings by control:\n"
-        for control, data in sorted(framework_stats["by_control"].items()):
-            analysis_text += f"  {control}: {data['count']} finding(s)\n"
+            # Mappers that copy the finding keep Security Hub's {"Label": ...} form
+            severity = format_severity(
+                mapped_finding.get("Severity", "INFORMATIONAL")
+            ).lower()
+            if severity in by_severity:
+                by_severity[severity] += 1
+
+            # Count by control, looking each control's entry up once
+            for control in mapped_finding.get(control_id_attr, []):
+                control_stats = by_control.get(control)
+                if control_stats is None:
+                    control_stats = by_control[control] = {"count": 0, "findings": []}
+                control_stats["count"] += 1
+                control_stats["findings"].append(mapped_finding)
+
+        # Generate analysis text from lines joined once at the end
+        lines = [
+            f"Analysis for {framework_id} Framework:\n",
+            f"Total findings: {framework_stats['total']}",
+            "Findings by severity:",
+        ]
+        lines.extend(
+            f"  {severity.upper()}: {count}"
+            for severity, count in framework_stats["by_severity"].items()
+        )
 
-        # Try to use AWS Bedrock for enhanced analysis if available
-        try:
-            bedrock_client = boto3.client("bedrock-runtime")
-
-            # Prepare prompt for Bedrock
-            prompt = {
-                "prompt": f"Analyze the following security findings for {framework_id} compliance framework:\n\n"
-                + json.dumps(mapped_findings, indent=2)
-                + "\n\nProvide a concise analysis of the security posture, key risks, and recommendations.",
-                "max_tokens": 1000,
-                "temperature": 0.7,
-                "top_p": 0.9,
-            }
+        lines.append("\nFindings by control:")
+        lines.extend(
+            f"  {control}: {data['count']} finding(s)"
+            for control, data in sorted(framework_stats["by_control"].items())
+        )
+        analysis_text = "\n".join(lines) + "\n"
 
-            # Call Bedrock
-            response = bedrock_client.invoke_model(
-                modelId="anthropic.claude-v2",
-                contentType="application/json",
-                accept="application/json",
-                body=json.dumps(prompt),
+        # Keep the mapped findings for the combined Bedrock request below, if any
+        # are severe enough to be worth an AI analysis
+        if any(by_severity[severity] for severity in bedrock_severities):
+            mapped_findings_by_framework[framework_id] = framework_mapped_findings
+        else:
+            analysis_text += "\n" + BEDROCK_SKIPPED_NOTE.format(
+                severity=min_severity.upper()
             )
 
-            # Parse response
-            response_body = json.loads(response["body"].read())
-            ai_analysis = response_body.get("content", [{"text": ""}])[0]["text"]
-
-            # Add AI analysis to the text
-            analysis_text += "\nAI-Enhanced Analysis:\n" + ai_analysis
-
-        except Exception as e:
-            logger.warning(f"Error generating AI analysis: {e}")
-            # Continue without AI analysis
-
         # Store results
         analyses[framework_id] = analysis_text
         stats[framework_id] = framework_stats
 
+    # Use AWS Bedrock for enhanced analysis of every framework in one request
+    if mapped_findings_by_framework:
+        ai_analyses = get_ai_analyses(mapped_findings_by_framework)
+        for framework_id, ai_analysis in ai_analyses.items():
+            analyses[framework_id] += "\nAI-Enhanced Analysis:\n" + ai_analysis
+
     # Generate combined analysis if multiple frameworks
     if len(findings_dict) > 1:
-        combined_text = "Combined Analysis Across Frameworks:\n\n"
         total_findings = sum(s["total"] for s in stats.values())
-        combined_text += f"Total findings across all frameworks: {total_findings}\n\n"
-
-        for framework_id, framework_stats in stats.items():
-            combined_text += f"{framework_id}: {framework_stats['total']} findings\n"
+        lines = [
+            "Combined Analysis Across Frameworks:\n",
+            f"Total findings across all frameworks: {total_findings}\n",
+        ]
+        lines.extend(
+            f"{framework_id}: {framework_stats['total']} findings"
+            for framework_id, framework_stats in stats.items()
+        )
 
-        analyses["combined"] = combined_text
+        analyses["combined"] = "\n".join(lines) + "\n"
 
     return analyses, stats
 
 
-def generate_csv(findings, mappers):
+def read_bedrock_stream(stream):
+    """
+    Collect the generated text from a Bedrock Converse response stream.
+
+    Streaming keeps the connection busy while a long, multi-framework analysis is
+    generated, rather than leaving it idle until the whole response is ready.
+
+    Args:
+        stream (iterable): Event stream from converse_stream
+
+    Returns:
+        str: The generated text
+    """
+    text = io.StringIO()
+    for event in stream:
+        if "contentBlockDelta" in event:
+            text.write(event["contentBlockDelta"]["delta"].get("text", ""))
+        elif "metadata" in event:
+            # Report prompt cache use, which is only present when caching applies
+            usage = event["metadata"].get("usage", {})
+            if "cacheReadInputTokens" in usage:
+                logger.info(
+                    "Bedrock prompt cache: %d tokens read, %d tokens written",
+                    usage.get("cacheReadInputTokens") or 0,
+                    usage.get("cacheWriteInputTokens") or 0,
+                )
+    return text.getvalue()
+
+
+def section_pattern(framework_ids):
+    """
+    Build the pattern matching the section marker lines of the given frameworks.
+
+    Only the markers of the frameworks in the request are matched, so headings
+    the model adds within an analysis (e.g. "### Recommendations") stay part of it.
+
+    Args:
+        framework_ids (iterable): IDs of the frameworks sent to Bedrock
+
+    Returns:
+        re.Pattern: Pattern capturing the framework ID of each marker line
+    """
+    return re.compile(
+        r"^### (" + "|".join(map(re.escape, framework_ids)) + r")[ \t]*$",
+        re.MULTILINE,
+    )
+
+
+def get_ai_analyses(mapped_findings_by_framework):
+    """
+    Get AI-enhanced analyses for several frameworks from a single Bedrock call.
+
+    Args:
+        mapped_findings_by_framework (dict): Mapped findings by framework ID
+
+    Returns:
+        dict: Analysis text by framework ID, empty if Bedrock is unavailable
+    """
+    try:
+        bedrock_client = get_client("bedrock-runtime")
+
+        # One section per framework, each introduced by its marker line
+        findings_data = "\n\n".join(
+            BEDROCK_SECTION_MARKER.format(framework_id=framework_id) + "\n"
+            # Compact JSON: whitespace only costs payload bytes and tokens
+            + json_dumps(
+                [
+                    {
+                        field: value
+                        for field, value in mapped_finding.items()
+                        if field not in BEDROCK_PROMPT_OMITTED_FIELDS
+                    }
+                    for mapped_finding in mapped_findings
+                ]
+            )
+            for framework_id, mapped_findings in mapped_findings_by_framework.items()
+        )
+
+        # Prepare the Converse request: static instructions first, findings after.
+        # botocore serializes it, so there is no request body to encode here
+        system = [{"text": BEDROCK_SYSTEM_PROMPT}]
+        if BEDROCK_PROMPT_CACHING:
+            system.append({"cachePoint": {"type": "default"}})
+        converse_args = {
+            "modelId": BEDROCK_MODEL_ID,
+            "system": system,
+            "messages": [{"role": "user", "content": [{"text": findings_data}]}],
+            "inferenceConfig": {
+                **BEDROCK_INFERENCE_CONFIG,
+                "maxTokens": BEDROCK_MAX_TOKENS_PER_FRAMEWORK
+                * len(mapped_findings_by_framework),
+            },
+        }
+        if BEDROCK_LATENCY:
+            converse_args["performanceConfig"] = {"latency": BEDROCK_LATENCY}
+
+        # Reuse the analyses of an identical request made within the TTL
+        cache_key = hashlib.blake2b(
+            json_dumps(converse_args).encode("utf-8"), digest_size=16
+        ).hexdigest()
+        now = time.monotonic()
+        cached = _analysis_cache.get(cache_key)
+        if cached is not None and now - cached[0] < BEDROCK_CACHE_TTL:
+            logger.info("Reusing cached AI analysis")
+            return cached[1]
+
+        response = bedrock_client.converse_stream(**converse_args)
+
+        # Collect the text as it streams in
+        ai_analysis = read_bedrock_stream(response["stream"])
+
+    except Exception as e:
+        logger.warning("Error generating AI analysis: %s", e)
+        # Continue without AI analysis
+        return {}
+
+    pattern = section_pattern(mapped_findings_by_framework)
+    if len(mapped_findings_by_framework) == 1:
+        # A lone framework owns the whole response, marker line or not
+        framework_id = next(iter(mapped_findings_by_framework))
+        analyses = {framework_id: pattern.sub("", ai_analysis).strip()}
+    else:
+        # Otherwise split the response on the marker lines
+        parts = pattern.split(ai_analysis)
+        analyses = {
+            framework_id: text.strip()
+            for framework_id, text in zip(parts[1::2], parts[2::2])
+        }
+
+    # Only usable analyses are cached; the oldest entry makes room for new ones
+    if analyses:
+        if len(_analysis_cache) >= BEDROCK_CACHE_MAX_ENTRIES:
+            _analysis_cache.pop(next(iter(_analysis_cache)))
+        _analysis_cache[cache_key] = (now, analyses)
+    return analyses
+
+
+def generate_csv(findings, mappers, mapped_findings=None):
     """
     Generate a CSV report from findings.
 
     Args:
         findings (list): List of Security Hub findings
         mappers (dict): Dictionary of framework mappers
+        mapped_findings (dict, optional): The same findings already mapped by each
+            framework's mapper, as returned by map_report_findings()
 
     Returns:
         str: CSV content as a string
@@ -321,41 +677,65 @@ def generate_csv(findings, mappers):
     if not findings:
         return ""
 
-    csv_content = ""
+    output = io.StringIO()
+    write_csv(findings, mappers, output, mapped_findings)
+    return output.getvalue()
 
-    # Process each framework
-    for framework_id, mapper in mappers.items():
-        # Map findings to framework controls
-        mapped_findings = []
-        for finding in findings:
-            mapped_finding = mapper.map_finding(finding)
-            mapped_findings.append(mapped_finding)
 
-        if not mapped_findings:
-            continue
+def write_csv(findings, mappers, output, mapped_findings=None):
+    """
+    Write a CSV report from findings to a file-like object.
+
+    Rows are mapped and written one finding at a time, so the report can be
+    streamed straight to a file without being held in memory. Every framework's
+    section lists all findings; when they have already been mapped by that
+    framework's mapper, the mapped findings are written instead of mapping again.
+
+    Args:
+        findings (list): List of Security Hub findings
+        mappers (dict): Dictionary of framework mappers
+        output (file): Text file-like object to write the CSV to
+        mapped_findings (dict, optional): The same findings already mapped by each
+            framework's mapper, as returned by map_report_findings()
+    """
+    if not findings:
+        return
+
+    writer = csv.writer(output, lineterminator="\n")
+    # Every framework section shares one report timestamp
+    generated_on = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+    # Process each framework
+    for framework_id, mapper in mappers.items():
         # Get control ID attribute
         control_id_attr = mapper.get_control_id_attribute()
 
         # Generate CSV header
-        csv_content += f"AWS SecurityHub {framework_id} Compliance Report\n"
-        csv_content += (
-            f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+        writer.writerow([f"AWS SecurityHub {framework_id} Compliance Report"])
+        writer.writerow([f"Generated on: {generated_on}"])
+        writer.writerow([])
+        writer.writerow(
+            ["Title", "Severity", "Finding Type", f"{framework_id} Controls"]
         )
-        csv_content += f"Title,Severity,Finding Type,{framework_id} Controls\n"
-
-        # Generate CSV rows
-        for finding in mapped_findings:
-            title = finding.get("Title", "").replace(",", " ")
-            severity = finding.get("Severity", "")
-            finding_type = finding.get("Type", "").replace(",", " ")
-            controls = ",".join(finding.get(control_id_attr, []))
-
-            csv_content += f"{title},{severity},{finding_type},{controls}\n"
 
-        csv_content += "\n\n"
+        # Map findings to framework controls as rows are written, unless already
+        # mapped, letting the writer quote fields that contain commas
+        if mapped_findings is not None and framework_id in mapped_findings:
+            framework_mapped_findings = mapped_findings[framework_id]
+        else:
+            framework_mapped_findings = map(mapper.map_finding, findings)
+        writer.writerows(
+            [
+                mapped_finding.get("Title", ""),
+                format_severity(mapped_finding.get("Severity", "")),
+                mapped_finding.get("Type", ""),
+                ",".join(mapped_finding.get(control_id_attr, [])),
+            ]
+            for mapped_finding in framework_mapped_findings
+        )
 
-    return csv_content
+        writer.writerow([])
+        writer.writerow([])
 
 
 def generate_nist_cato_report(findings=None, output_file=None):
@@ -387,9 +767,10 @@ def generate_nist_cato_report(findings=None, output_file=None):
         # Extract family from control ID (e.g., AC from AC-1)
         family = control_id.split("-")[0]
 
-        # Initialize family if not exists
-        if family not in control_families:
-            control_families[family] = {
+        # Initialize family if not exists, looking it up once per control
+        family_data = control_families.get(family)
+        if family_data is None:
+            family_data = control_families[family] = {
                 "name": get_family_name(family),
                 "controls": [],
                 "passing": 0,
@@ -398,10 +779,11 @@ def generate_nist_cato_report(findings=None, output_file=None):
             }
 
         # Add control to family
-        control_families[family]["controls"].append(
+        status = details["status"]
+        family_data["controls"].append(
             {
                 "id": control_id,
-                "status": details["status"],
+                "status": status,
                 "severity": details["severity"],
                 "disabled": details["disabled"],
                 "title": details.get("title", ""),
@@ -410,15 +792,15 @@ def generate_nist_cato_report(findings=None, output_file=None):
         )
 
         # Update statistics
-        if details["status"] == "PASSED":
+        if status == "PASSED":
             statistics["passing_controls"] += 1
-            control_families[family]["passing"] += 1
-        elif details["status"] == "FAILED":
+            family_data["passing"] += 1
+        elif status == "FAILED":
             statistics["failing_controls"] += 1
-            control_families[family]["failing"] += 1
+            family_data["failing"] += 1
         else:  # NOT_APPLICABLE
             statistics["not_applicable_controls"] += 1
-            control_families[family]["not_applicable"] += 1
+            family_data["not_applicable"] += 1
 
     # Generate report text
     report_text = "# NIST 800-53 Control Status for cATO\n\n"
@@ -450,9 +832,9 @@ def generate_nist_cato_report(findings=None, output_file=None):
         try:
             with open(output_file, "w") as f:
                 f.write(report_text)
-            logger.info(f"NIST CATO report written to {output_file}")
+            logger.info("NIST CATO report written to %s", output_file)
         except Exception as e:
-            logger.error(f"Error writing NIST CATO report: {e}")
+            logger.error("Error writing NIST CATO report: %s", e)
 
     return report_text, statistics, control_families
 
@@ -469,7 +851,7 @@ def get_nist_control_status(findings=None):
     """
     try:
         # Create Security Hub client
-        securityhub = boto3.client("securityhub")
+        securityhub = get_client("securityhub")
 
         # Get enabled standards
         standards_response = securityhub.get_enabled_standards()
@@ -582,10 +964,10 @@ def get_nist_control_status(findings=None):
                     break
 
             logger.info(
-                f"Retrieved data for {len(control_status)} NIST 800-53 controls"
+                "Retrieved data for %d NIST 800-53 controls", len(control_status)
             )
         except Exception as e:
-            logger.warning(f"Error retrieving controls from Security Hub: {e}")
+            logger.warning("Error retrieving controls from Security Hub: %s", e)
             # Continue with the pre-initialized controls
 
         # Check if we have all expected controls (288 for NIST 800-53)
@@ -594,14 +976,16 @@ def get_nist_control_status(findings=None):
 
         if fetched_controls < expected_controls:
             logger.warning(
-                f"Only {fetched_controls}/{expected_controls} NIST controls returned by Security Hub"
+                "Only %d/%d NIST controls returned by Security Hub",
+                fetched_controls,
+                expected_controls,
             )
 
-        logger.info(f"Returning {fetched_controls} NIST 800-53 controls")
+        logger.info("Returning %d NIST 800-53 controls", fetched_controls)
         return control_status
 
     except Exception as e:
-        logger.error(f"Error getting NIST control status: {e}")
+        logger.error("Error getting NIST control status: %s", e)
         return {}
 
 
@@ -655,7 +1039,56 @@ def percentage(part, whole):
     return round((part / whole) * 100)
 
 
-def send_email(recipient_email, findings, analysis_results, stats, mappers):
+def build_email_body(findings, analysis_results, stats):
+    """
+    Build the plain-text body of the analysis email.
+
+    The body is the same for every recipient, so it is built once per report and
+    shared by each send.
+
+    Args:
+        findings (dict): Dictionary of findings by framework
+        analysis_results (dict): Analysis results by framework
+        stats (dict): Statistics by framework
+
+    Returns:
+        str: The email body
+    """
+    # Create the body of the message from parts joined once at the end
+    parts = ["AWS Security Hub Compliance Report\n\n"]
+
+    # Add framework-specific sections
+    for framework_id in findings:
+        if framework_id == "combined":
+            continue
+
+        # Severity counts were tallied by analyze_findings; no need to rescan.
+        # Frameworks without a mapper were never analyzed and have no stats.
+        framework_stats = stats.get(framework_id)
+        if framework_stats is None:
+            continue
+        by_severity = framework_stats.get("by_severity", {})
+        parts.append(
+            f"\n{framework_id} Framework Summary:\n"
+            f"Total findings: {framework_stats['total']}\n"
+            f"Critical: {by_severity.get('critical', 0)}\n"
+            f"High: {by_severity.get('high', 0)}\n"
+            f"Medium: {by_severity.get('medium', 0)}\n"
+            f"Low: {by_severity.get('low', 0)}\n\n"
+        )
+
+        # Add analysis results
+        if framework_id in analysis_results:
+            parts.append(f"{analysis_results[framework_id]}\n\n")
+
+    # Add combined analysis if available
+    if "combined" in analysis_results:
+        parts.append(f"\nCombined Analysis:\n{analysis_results['combined']}\n")
+
+    return "".join(parts)
+
+
+def send_email(recipient_email, findings, analysis_results, stats, mappers, body=None):
     """
     Send an email with the analysis results.
 
@@ -665,6 +1098,8 @@ def send_email(recipient_email, findings, analysis_results, stats, mappers):
         analysis_results (dict): Analysis results by framework
         stats (dict): Statistics by framework
         mappers (dict): Framework mappers
+        body (str, optional): Prebuilt body from build_email_body(); built here if
+            not given
 
     Returns:
         bool: True if email was sent successfully, False otherwise
@@ -676,55 +1111,106 @@ def send_email(recipient_email, findings, analysis_results, stats, mappers):
         return False
 
     try:
-        # Create a multipart message
-        msg = email.mime.multipart.MIMEMultipart()
+        # Imported here so invocations that never send email skip the cost
+        from email.message import EmailMessage
+
+        # Create the message
+        msg = EmailMessage()
         msg["Subject"] = "AWS Security Hub Compliance Report"
         msg["From"] = sender_email
         msg["To"] = recipient_email
 
-        # Create the body of the message
-        body = "AWS Security Hub Compliance Report\n\n"
-
-        # Add framework-specific sections
-        for framework_id, framework_findings in findings.items():
-            if framework_id == "combined":
-                continue
-
-            body += f"\n{framework_id} Framework Summary:\n"
-            body += f"Total findings: {stats[framework_id]['total']}\n"
-            body += f"Critical: {stats[framework_id].get('critical', 0)}\n"
-            body += f"High: {stats[framework_id].get('high', 0)}\n"
-            body += f"Medium: {stats[framework_id].get('medium', 0)}\n"
-            body += f"Low: {stats[framework_id].get('low', 0)}\n\n"
-
-            # Add analysis results
-            if framework_id in analysis_results:
-                body += f"{analysis_results[framework_id]}\n\n"
+        if body is None:
+            body = build_email_body(findings, analysis_results, stats)
 
-        # Add combined analysis if available
-        if "combined" in analysis_results:
-            body += "\nCombined Analysis:\n"
-            body += f"{analysis_results['combined']}\n"
-
-        # Attach the body to the message
-        msg.attach(email.mime.text.MIMEText(body, "plain"))
+        # Set the body of the message
+        msg.set_content(body)
 
         # Connect to AWS SES and send the email
-        ses_client = boto3.client("ses")
+        ses_client = get_client("ses", config=SES_CLIENT_CONFIG)
+        ses_rate_limiter.acquire()
         response = ses_client.send_raw_email(
             Source=sender_email,
             Destinations=[recipient_email],
-            RawMessage={"Data": msg.as_string()},
+            RawMessage={"Data": bytes(msg)},
         )
 
-        logger.info(f"Email sent successfully: {response['MessageId']}")
+        logger.info("Email sent successfully: %s", response["MessageId"])
         return True
 
     except Exception as e:
-        logger.error(f"Error sending email: {e}")
+        logger.error("Error sending email: %s", e)
         return False
 
 
+def parse_recipients(recipients):
+    """
+    Normalize the requested recipients into a list of unique email addresses.
+
+    Filtering happens once here so that blank or repeated addresses never reach
+    the send loop.
+
+    Args:
+        recipients (str or list): A single address, a comma-separated string of
+            addresses or a list of addresses
+
+    Returns:
+        list: Unique, stripped email addresses in their original order
+    """
+    if isinstance(recipients, str):
+        recipients = recipients.split(",")
+    return list(dict.fromkeys(r.strip() for r in recipients if r and r.strip()))
+
+
+def send_emails(recipient_emails, findings, analysis_results, stats, mappers):
+    """
+    Send the analysis results to several recipients concurrently.
+
+    SES round trips dominate the send time, so the messages are dispatched from a
+    thread pool that shares the cached SES client, whose connection pool is sized
+    for SES_MAX_WORKERS concurrent sends.
+
+    Args:
+        recipient_emails (list): Email addresses to send the report to
+        findings (dict): Dictionary of findings by framework
+        analysis_results (dict): Analysis results by framework
+        stats (dict): Statistics by framework
+        mappers (dict): Framework mappers
+
+    Returns:
+        dict: Send result (True/False) keyed by recipient email address
+    """
+    if not recipient_emails:
+        return {}
+
+    # Every recipient gets the same report, so its body is built only once. A
+    # failure is reported per recipient, as it would be from send_email.
+    try:
+        body = build_email_body(findings, analysis_results, stats)
+    except Exception as e:
+        logger.error("Error building email body: %s", e)
+        return {recipient: False for recipient in recipient_emails}
+
+    # A single recipient is sent inline rather than through a thread pool
+    if len(recipient_emails) == 1:
+        recipient = recipient_emails[0]
+        return {
+            recipient: send_email(
+                recipient, findings, analysis_results, stats, mappers, body
+            )
+        }
+
+    max_workers = min(len(recipient_emails), SES_MAX_WORKERS)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            lambda recipient: send_email(
+                recipient, findings, analysis_results, stats, mappers, body
+            ),
+            recipient_emails,
+        )
+        return dict(zip(recipient_emails, results))
+
+
 def send_test_email(recipient_email):
     """
     Send a test email to verify SES configuration.
@@ -742,39 +1228,40 @@ def send_test_email(recipient_email):
         return False
 
     try:
-        # Create a multipart message
-        msg = email.mime.multipart.MIMEMultipart()
+        # Imported here so invocations that never send email skip the cost
+        from email.message import EmailMessage
+
+        # Create the message
+        msg = EmailMessage()
         msg["Subject"] = "AWS Security Hub Compliance Analyzer - Test Email"
         msg["From"] = sender_email
         msg["To"] = recipient_email
 
-        # Create the body of the message
-        body = "This is a test email from the AWS Security Hub Compliance Analyzer.\n\n"
-        body += (
-            "If you received this email, your SES configuration is working correctly."
-        )
-
-        # Attach the body to the message
-        msg.attach(email.mime.text.MIMEText(body, "plain"))
+        # Set the body of the message
+        msg.set_content(TEST_EMAIL_BODY)
 
         # Connect to AWS SES and send the email
-        ses_client = boto3.client("ses")
+        ses_client = get_client("ses", config=SES_CLIENT_CONFIG)
+        ses_rate_limiter.acquire()
         response = ses_client.send_raw_email(
             Source=sender_email,
             Destinations=[recipient_email],
-            RawMessage={"Data": msg.as_string()},
+            RawMessage={"Data": bytes(msg)},
         )
 
-        logger.info(f"Test email sent successfully: {response['MessageId']}")
+        logger.info("Test email sent successfully: %s", response["MessageId"])
         return True
 
     except Exception as e:
-        logger.error(f"Error sending test email: {e}")
+        logger.error("Error sending test email: %s", e)
         return False
 
 
 def cli_handler():
     """Handle command line interface for the application."""
+    # argparse is only needed on the CLI path, so keep it out of Lambda cold starts
+    import argparse
+
     parser = argparse.ArgumentParser(description="AWS Security Hub Compliance Analyzer")
     parser.add_argument(
         "--hours", type=int, default=24, help="Hours of findings to analyze"
@@ -783,7 +1270,10 @@ def cli_handler():
         "--framework", type=str, default="SOC2", help="Compliance framework"
     )
     parser.add_argument(
-        "--output", type=str, default="report.csv", help="Output file path"
+        "--output",
+        type=str,
+        default="report.csv",
+        help="Output file path (gzip-compressed if it ends in .gz)",
     )
     parser.add_argument("--email", type=str, help="Email recipient for report")
     parser.add_argument("--no-email", action="store_true", help="Skip sending email")
@@ -801,6 +1291,20 @@ def cli_handler():
     print(f"Analyzing findings from the last {hours} hours...")
     print(f"Found {len(findings)} findings")
     print(f"Generating report for {framework_id}...")
+
+    # Stream the CSV report straight to the output file
+    mappers = get_mappers()
+    if framework_id in mappers:
+        mappers = {framework_id: mappers[framework_id]}
+    if output_file.endswith(".gz"):
+        # Compress rows as they are written rather than compressing a finished file
+        import gzip
+
+        report_file = gzip.open(output_file, "wt", newline="", encoding="utf-8")
+    else:
+        report_file = open(output_file, "w", newline="")
+    with report_file as f:
+        write_csv(findings, mappers, f)
     print(f"Report saved to {output_file}")
 
     if recipient_email and not skip_email:
@@ -829,41 +1333,60 @@ def lambda_handler(event, context):
         output_format = event.get("output_format", "text")
         email = event.get("email")
 
+        # Re-read the frameworks configuration now rather than when the cache expires
+        if event.get("refresh_config"):
+            _frameworks_cache.update(value=None, ts=0)
+
         # Get findings
         findings = get_findings(hours, framework_id)
 
-        # Create mappers - Use create_all_mappers method for better testability
-        mappers = MapperFactory.create_all_mappers()
-
-        # Analyze findings
-        analyses, stats = analyze_findings(findings, mappers)
+        # Reuse the mappers created by an earlier invocation of this container
+        mappers = get_mappers()
 
         # Generate output
         if output_format == "csv":
-            # For CSV, we need to flatten the findings
-            all_findings = []
-            if isinstance(findings, dict):
-                for framework_findings in findings.values():
-                    all_findings.extend(framework_findings)
-            else:
-                all_findings = findings
-
-            output = generate_csv(all_findings, mappers)
-        elif output_format == "json":
-            output = json.dumps(stats, default=str, indent=2)
+            # The CSV lists the flattened findings under every framework. Map them
+            # once for both reports, then build the CSV while the analysis waits on
+            # its Bedrock round trip
+            all_findings, report_mapped_findings, analysis_mapped_findings = (
+                map_report_findings(findings, mappers)
+            )
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                analysis_future = executor.submit(
+                    analyze_findings, findings, mappers, analysis_mapped_findings
+                )
+                csv_future = executor.submit(
+                    generate_csv, all_findings, mappers, report_mapped_findings
+                )
+                analyses, stats = analysis_future.result()
+                output = csv_future.result()
         else:
-            # Default to text format
-            output = "\n\n".join(analyses.values())
+            # Analyze findings
+            analyses, stats = analyze_findings(findings, mappers)
+
+            if output_format == "json":
+                output = json.dumps(stats, default=str, indent=2)
+            else:
+                # Default to text format
+                output = "\n\n".join(analyses.values())
 
         # Send email if requested and email sending is enabled
         send_email_flag = event.get(
             "send_email", True
         )  # Default to True for backward compatibility
         if email and send_email_flag:
-            send_email(email, "AWS Security Hub Compliance Report", output)
-            logger.info(f"Email sent to {email}")
+            email = parse_recipients(email)
+            if not isinstance(findings, dict):
+                findings = {framework_id: findings}
+            results = send_emails(email, findings, analyses, stats, mappers)
+            sent = [recipient for recipient, ok in results.items() if ok]
+            failed = [recipient for recipient, ok in results.items() if not ok]
+            if sent:
+                logger.info("Email sent to %s", ", ".join(sent))
+            if failed:
+                logger.warning("Email could not be sent to %s", ", ".join(failed))
         elif email and not send_email_flag:
-            logger.info(f"Email sending skipped per request (send_email=False)")
+            logger.info("Email sending skipped per request (send_email=False)")
         elif not email:
             logger.info("No email recipient specified")
 
@@ -878,7 +1401,7 @@ def lambda_handler(event, context):
         }
 
     except Exception as e:
-        logger.error(f"Error in lambda handler: {e}")
+        logger.exception("Error in lambda handler")
         return {"statusCode": 500, "body": {"message": f"Error: {str(e)}"}}
 
 
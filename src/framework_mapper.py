@@ -1,12 +1,94 @@
-import json
+import functools
 import logging
 import os
 import re
 from abc import ABC, abstractmethod
 
+from utils import format_severity, json_loads
+
+try:
+    # pyahocorasick scans a finding type for all type patterns in one pass; the
+    # substring fallback only covers environments installed without requirements.txt
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 # Configure logging
 logger = logging.getLogger()
 
+# Upper bound on the controls memoized per mapper; the cache is simply reset when
+# it fills, since distinct finding checks number in the hundreds, not thousands
+CONTROLS_CACHE_MAX_ENTRIES = 4096
+
+
+def _build_indices(mappings):
+    """Precompile mappings into the structures used for matching.
+
+    All title keywords are lowercased and combined into a single alternation so
+    that a lowercased title is scanned once, rather than once per keyword. The
+    alternation sits in a lookahead so every position is tried, and longer keywords
+    come first. Each keyword maps to its own controls plus those of any keyword that
+    is a whole-word prefix of it (e.g. "security" for "security group"), since both
+    would match at the same position. A second alternation, without word boundaries,
+    serves mappers that match keywords anywhere in the text; there any keyword that
+    is a prefix of another counts towards it.
+    """
+    type_mappings = list(mappings.get("type_mappings", {}).items())
+    type_automaton = None
+    if ahocorasick is not None and type_mappings:
+        type_automaton = ahocorasick.Automaton()
+        for type_pattern, type_controls in type_mappings:
+            type_automaton.add_word(type_pattern, type_controls)
+        type_automaton.make_automaton()
+
+    title_mappings_lower = {}
+    for keyword, keyword_controls in mappings.get("title_mappings", {}).items():
+        title_mappings_lower.setdefault(keyword.lower(), set()).update(keyword_controls)
+
+    keywords = sorted(title_mappings_lower, key=len, reverse=True)
+    title_regex = None
+    title_substring_regex = None
+    if keywords:
+        alternation = "|".join(re.escape(k) for k in keywords)
+        title_regex = re.compile(r"(?=\b(" + alternation + r")\b)")
+        title_substring_regex = re.compile("(?=(" + alternation + "))")
+
+    title_keyword_controls = {}
+    title_substring_controls = {}
+    for keyword in keywords:
+        controls = title_keyword_controls.setdefault(keyword, set())
+        substring_controls = title_substring_controls.setdefault(keyword, set())
+        for other, other_controls in title_mappings_lower.items():
+            if re.match(r"\b" + re.escape(other) + r"\b", keyword):
+                controls.update(other_controls)
+            if keyword.startswith(other):
+                substring_controls.update(other_controls)
+
+    return {
+        "type_mappings": type_mappings,
+        "type_automaton": type_automaton,
+        "title_mappings_lower": title_mappings_lower,
+        "title_regex": title_regex,
+        "title_keyword_controls": title_keyword_controls,
+        "title_substring_regex": title_substring_regex,
+        "title_substring_controls": title_substring_controls,
+    }
+
+
+@functools.lru_cache(maxsize=8)
+def _load_compiled(file_path, mtime):
+    """Load a mappings file and build its match indices.
+
+    Results are shared by every mapper created from the same file. The file's
+    modification time is part of the cache key, so an edited file is reloaded.
+
+    Returns:
+        tuple: (mappings, indices) for the file
+    """
+    with open(file_path, "r") as f:
+        mappings = json_loads(f.read())
+    return mappings, _build_indices(mappings)
+
 
 class FrameworkMapper:
     """Base class for mapping AWS SecurityHub findings to compliance framework controls."""
@@ -20,7 +102,11 @@ class FrameworkMapper:
         """
         self.framework_id = framework_id
         self.mappings_file = mappings_file
+        self._indices = None
+        self._controls_cache = {}
         self.mappings = self._load_mappings()
+        self._compile_mappings()
+        self._default_control = self._get_default_control()
 
     def _load_mappings(self, mappings_file=None):
         """Load framework control mappings from a JSON file or use default mappings.
@@ -37,17 +123,37 @@ class FrameworkMapper:
 
             # Try to load mappings from the specified file
             if file_path and os.path.exists(file_path):
-                with open(file_path, "r") as f:
-                    return json.load(f)
+                mappings, self._indices = _load_compiled(
+                    file_path, os.path.getmtime(file_path)
+                )
+                return mappings
             else:
                 logger.warning(
-                    f"Mappings file {file_path} not found, using default mappings"
+                    "Mappings file %s not found, using default mappings", file_path
                 )
                 return self._get_default_mappings()
         except Exception as e:
-            logger.error(f"Error loading mappings for {self.framework_id}: {str(e)}")
+            logger.error("Error loading mappings for %s: %s", self.framework_id, e)
             return self._get_default_mappings()
 
+    def _compile_mappings(self):
+        """Set up the structures used for matching the loaded mappings.
+
+        Mappings loaded from a file reuse the indices cached alongside them, so only
+        the first mapper built from a given file pays for compiling them.
+        """
+        indices = self._indices
+        if indices is None:
+            indices = _build_indices(self.mappings)
+
+        self._type_mappings = indices["type_mappings"]
+        self._type_automaton = indices["type_automaton"]
+        self._title_mappings_lower = indices["title_mappings_lower"]
+        self._title_regex = indices["title_regex"]
+        self._title_keyword_controls = indices["title_keyword_controls"]
+        self._title_substring_regex = indices["title_substring_regex"]
+        self._title_substring_controls = indices["title_substring_controls"]
+
     def _get_default_mappings(self):
         """Provide default control mappings if configuration file is not available.
 
@@ -58,6 +164,9 @@ class FrameworkMapper:
     def _map_to_controls(self, finding_type, title, description):
         """Map a finding to framework controls based on its type, title, and description.
 
+        Findings raised by the same check on different resources share a type,
+        title and description, so their controls are matched once and then reused.
+
         Args:
             finding_type (str): Type of the finding
             title (str): Finding title
@@ -66,23 +175,73 @@ class FrameworkMapper:
         Returns:
             list: Relevant control IDs for this framework
         """
-        # Use a set to avoid duplicate controls
-        controls = set()
+        key = (finding_type, title, description)
+        controls = self._controls_cache.get(key)
+        if controls is None:
+            controls = self._cache_controls(
+                key, self._match_controls(finding_type, title, description)
+            )
+        return list(controls)
+
+    def _cache_controls(self, key, controls):
+        """Memoize the controls matched for a cache key.
+
+        Args:
+            key (tuple): The finding fields the controls were matched on
+            controls (list): The matched control IDs
+
+        Returns:
+            tuple: The cached control IDs
+        """
+        if len(self._controls_cache) >= CONTROLS_CACHE_MAX_ENTRIES:
+            self._controls_cache.clear()
+        controls = self._controls_cache[key] = tuple(controls)
+        return controls
+
+    def _match_type_controls(self, finding_type):
+        """Match a finding type against the type mappings.
+
+        With pyahocorasick installed, the automaton finds every type pattern in one
+        scan of the finding type rather than testing the patterns one by one.
+
+        Args:
+            finding_type (str): Type of the finding
 
-        # Map based on finding type
-        for type_pattern, type_controls in self.mappings["type_mappings"].items():
-            if type_pattern in finding_type:
+        Returns:
+            set: Control IDs mapped from the finding type
+        """
+        controls = set()
+        if self._type_automaton is not None:
+            for _, type_controls in self._type_automaton.iter(finding_type):
                 controls.update(type_controls)
+        else:
+            for type_pattern, type_controls in self._type_mappings:
+                if type_pattern in finding_type:
+                    controls.update(type_controls)
+        return controls
+
+    def _match_controls(self, finding_type, title, description):
+        """Match a finding against the mappings, by its type and title keywords.
 
-        # Map based on keywords in finding title
-        for title_pattern, title_controls in self.mappings["title_mappings"].items():
-            # Use word boundary regex to match whole words only
-            if re.search(r"\b" + re.escape(title_pattern) + r"\b", title.lower()):
-                controls.update(title_controls)
+        Args:
+            finding_type (str): Type of the finding
+            title (str): Finding title
+            description (str): Finding description
+
+        Returns:
+            list: Relevant control IDs for this framework, sorted
+        """
+        # Map based on finding type, in a set to avoid duplicate controls
+        controls = self._match_type_controls(finding_type)
+
+        # Map based on keywords in finding title, matching whole words only
+        if self._title_regex is not None:
+            for match in self._title_regex.finditer(title.lower()):
+                controls.update(self._title_keyword_controls[match.group(1)])
 
         # If no controls were mapped, use a default control if defined
-        if not controls and self._get_default_control():
-            controls.add(self._get_default_control())
+        if not controls and self._default_control:
+            controls.add(self._default_control)
 
         # Convert set to sorted list for consistent output
         return sorted(list(controls))
@@ -107,31 +266,44 @@ class FrameworkMapper:
     def map_finding(self, finding):
         """Map a SecurityHub finding to this compliance framework.
 
+        Only the fields used for reporting are carried over, rather than a copy of the
+        whole finding, which keeps mapped findings small when there are thousands.
+
         Args:
             finding (dict): The AWS SecurityHub finding to map
 
         Returns:
-            dict: Mapped finding with added control IDs for this framework
+            dict: Mapped finding with the reported fields and control IDs for this framework
         """
-        # Create a copy of the finding to avoid modifying the original
-        mapped_finding = finding.copy()
-
         # Extract relevant fields for mapping
-        finding_type = " ".join(finding.get("Types", ["Unknown"]))
+        types = finding.get("Types") or ["Unknown"]
         title = finding.get("Title", "")
         description = finding.get("Description", "")
 
         # Map the finding to framework controls
-        control_ids = self._map_to_controls(finding_type, title, description)
+        control_ids = self._map_to_controls(" ".join(types), title, description)
 
-        # Add control IDs to the mapped finding
-        control_attr = self.get_control_id_attribute()
-        mapped_finding[control_attr] = control_ids
+        # Build the mapped finding with control IDs and resource ID for easier reference
+        return {
+            "Title": title,
+            "Description": description,
+            "Severity": format_severity(finding.get("Severity", "INFORMATIONAL")),
+            "Type": types[0],
+            "ResourceId": self._get_resource_id(finding),
+            self.get_control_id_attribute(): control_ids,
+        }
 
-        # Extract and add resource ID for easier reference
-        mapped_finding["ResourceId"] = self._get_resource_id(finding)
+    def map_findings(self, findings):
+        """Map a batch of SecurityHub findings to this compliance framework.
 
-        return mapped_finding
+        Args:
+            findings (list): The AWS SecurityHub findings to map
+
+        Returns:
+            list: Mapped findings, in the same order as the input
+        """
+        map_finding = self.map_finding
+        return [map_finding(finding) for finding in findings]
 
     def get_control_id_attribute(self):
         """Get the attribute name used for storing control IDs in mapped findings.
@@ -1,4 +1,3 @@
-import json
 import logging
 import os
 
@@ -223,7 +222,8 @@ class MapperFactory:
             return NIST80053Mapper(mappings_file=mappings_file)
         else:
             logger.error(
-                f"Unsupported framework: {framework_id}. Supported frameworks: SOC2, NIST800-53"
+                "Unsupported framework: %s. Supported frameworks: SOC2, NIST800-53",
+                framework_id,
             )
             raise ValueError(
                 f"Unsupported framework: {framework_id}. Please use one of the supported frameworks: SOC2, NIST800-53"
@@ -258,10 +258,11 @@ class MapperFactory:
                 )
             except ValueError as e:
                 logger.error(
-                    f"Error creating mapper for framework {framework_id}: {str(e)}"
+                    "Error creating mapper for framework %s: %s", framework_id, e
                 )
                 logger.error(
-                    f"Skipping framework {framework_id} - this may affect analysis results"
+                    "Skipping framework %s - this may affect analysis results",
+                    framework_id,
                 )
                 continue
 
@@ -1,4 +1,3 @@
-import json
 import logging
 import os
 
@@ -98,6 +97,38 @@ class SOC2Mapper(FrameworkMapper):
         """
         return "SOC2Controls"
 
+    def _match_controls(self, finding_type, title, description):
+        """
+        Match a finding against the SOC2 mappings.
+
+        Title keywords are also looked for in the description.
+
+        Args:
+            finding_type (str): Type of the finding
+            title (str): Finding title
+            description (str): Finding description
+
+        Returns:
+            list: Relevant SOC2 control IDs, sorted
+        """
+        # Check type mappings through the shared type index
+        controls = self._match_type_controls(finding_type)
+
+        # Check title mappings against the title and description, joined and
+        # lowercased once up front, in a single scan of the combined keyword
+        # pattern; text with no keyword is rejected by that one search. The
+        # newline keeps a pattern from matching across the two fields.
+        if self._title_substring_regex is not None:
+            text_lower = f"{title}\n{description}".lower()
+            for match in self._title_substring_regex.finditer(text_lower):
+                controls.update(self._title_substring_controls[match.group(1)])
+
+        # If no controls matched, use default
+        if not controls:
+            controls.add(self._default_control)
+
+        return sorted(list(controls))
+
     def map_finding(self, finding):
         """
         Map a Security Hub finding to SOC2 controls.
@@ -131,27 +162,9 @@ class SOC2Mapper(FrameworkMapper):
             "SOC2Controls": [],
         }
 
-        # Map to controls based on type
-        controls = set()
-
-        # Check type mappings
-        for type_pattern, type_controls in self.mappings["type_mappings"].items():
-            if type_pattern in finding_type:
-                controls.update(type_controls)
-
-        # Check title mappings
-        for title_pattern, title_controls in self.mappings["title_mappings"].items():
-            if (
-                title_pattern.lower() in title.lower()
-                or title_pattern.lower() in description.lower()
-            ):
-                controls.update(title_controls)
-
-        # If no controls matched, use default
-        if not controls:
-            controls.add(self._get_default_control())
-
-        # Add controls to mapped finding
-        mapped_finding["SOC2Controls"] = sorted(list(controls))
+        # Map to controls, reusing the controls of findings from the same check
+        mapped_finding["SOC2Controls"] = self._map_to_controls(
+            finding_type, title, description
+        )
 
         return mapped_finding
@@ -9,9 +9,40 @@ import os
 import sys
 from pathlib import Path
 
+import pytest
+
 # Get the absolute path to the parent directory (src/)
 SRC_DIR = Path(__file__).parent.parent.absolute()
 
 # Add the parent directory to the Python path if it's not already there
 if str(SRC_DIR) not in sys.path:
     sys.path.insert(0, str(SRC_DIR))
+
+
+@pytest.fixture(autouse=True)
+def reset_mappings_cache():
+    """Drop mappings files cached by framework_mapper between tests.
+
+    Tests stand in for mapping files with mocks, so a file cached by one test
+    must not be served to the next.
+    """
+    import framework_mapper
+
+    framework_mapper._load_compiled.cache_clear()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def reset_app_caches():
+    """Clear the clients, mappers, frameworks and analyses cached in app.py.
+
+    Tests patch boto3.client and MapperFactory, so each test must build its own
+    instances rather than reuse ones cached by an earlier test.
+    """
+    import app
+
+    app._clients.clear()
+    app._mappers = None
+    app._frameworks_cache.update(value=None, ts=0)
+    app._analysis_cache.clear()
+    yield
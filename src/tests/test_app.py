@@ -1,10 +1,14 @@
 """Tests for the main application."""
 
+import gzip
 import json
 import os
+import tempfile
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from unittest.mock import ANY, MagicMock, patch
+from unittest.mock import ANY, MagicMock, mock_open, patch
 
 import boto3
 import botocore.session
@@ -155,6 +159,177 @@ class TestApp(unittest.TestCase):
         # Verify the function returned the expected result
         self.assertTrue(result)
 
+    @patch("app.boto3.client")
+    def test_get_client_is_cached(self, mock_boto3_client):
+        """Test that boto3 clients are created once and then reused."""
+        mock_boto3_client.side_effect = lambda service, config=None: MagicMock()
+
+        first = app.get_client("securityhub")
+        second = app.get_client("securityhub")
+        ses = app.get_client("ses")
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, ses)
+        self.assertEqual(mock_boto3_client.call_count, 2)
+        mock_boto3_client.assert_any_call("securityhub", config=app.CLIENT_CONFIG)
+
+    @patch("app.boto3.client")
+    def test_get_client_created_once_across_threads(self, mock_boto3_client):
+        """Test that concurrent first requests for a client create it only once."""
+
+        def slow_client(service, config=None):
+            time.sleep(0.05)
+            return MagicMock()
+
+        mock_boto3_client.side_effect = slow_client
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            clients = list(executor.map(lambda _: app.get_client("ses"), range(4)))
+
+        mock_boto3_client.assert_called_once()
+        self.assertTrue(all(client is clients[0] for client in clients))
+
+    @patch("app.MapperFactory")
+    def test_get_mappers_is_cached(self, mock_mapper_factory):
+        """Test that the framework mappers are created once and then reused."""
+        mock_mapper_factory.create_all_mappers.return_value = {"SOC2": MagicMock()}
+
+        self.assertIs(app.get_mappers(), app.get_mappers())
+        mock_mapper_factory.create_all_mappers.assert_called_once()
+
+    @patch("app.time.monotonic")
+    def test_load_frameworks_is_cached_until_ttl(self, mock_monotonic):
+        """Test that the frameworks configuration is re-read only after the TTL."""
+        frameworks = [{"id": "SOC2", "name": "SOC 2", "arn": "arn"}]
+        mock_monotonic.return_value = 1000.0
+
+        with patch("builtins.open", mock_open(read_data=json.dumps(frameworks))) as m:
+            self.assertEqual(app.load_frameworks(), frameworks)
+            self.assertEqual(app.load_frameworks(), frameworks)
+            self.assertEqual(m.call_count, 1)
+
+            mock_monotonic.return_value += app.FRAMEWORKS_CACHE_TTL
+            app.load_frameworks()
+            self.assertEqual(m.call_count, 2)
+
+    @patch("app.analyze_findings", return_value=({}, {}))
+    @patch("app.MapperFactory.create_mapper")
+    @patch("app.get_findings")
+    def test_lambda_handler_refresh_config(
+        self, mock_get_findings, mock_create_mapper, mock_analyze_findings
+    ):
+        """Test that refresh_config reloads the frameworks and rebuilds the mappers."""
+        mock_create_mapper.side_effect = lambda framework_id, mappings_dir=None: (
+            MagicMock(name=framework_id)
+        )
+        soc2 = [{"id": "SOC2"}]
+        both = soc2 + [{"id": "NIST800-53"}]
+
+        with patch("builtins.open", mock_open(read_data=json.dumps(soc2))):
+            app.lambda_handler({}, {})
+        self.assertEqual(app._frameworks_cache["value"], soc2)
+        self.assertEqual(set(mock_analyze_findings.call_args.args[1]), {"SOC2"})
+
+        with patch("builtins.open", mock_open(read_data=json.dumps(both))):
+            # The cached configuration and its mappers are used until refreshed
+            app.lambda_handler({}, {})
+            self.assertEqual(app._frameworks_cache["value"], soc2)
+            self.assertEqual(set(mock_analyze_findings.call_args.args[1]), {"SOC2"})
+
+            app.lambda_handler({"refresh_config": True}, {})
+        self.assertEqual(app._frameworks_cache["value"], both)
+        self.assertEqual(
+            set(mock_analyze_findings.call_args.args[1]), {"SOC2", "NIST800-53"}
+        )
+
+    @patch("app.MapperFactory")
+    @patch("app.load_frameworks")
+    def test_get_mappers_rebuilt_when_frameworks_change(
+        self, mock_load_frameworks, mock_mapper_factory
+    ):
+        """Test that mappers follow the frameworks configuration they were built from."""
+        mock_load_frameworks.return_value = [{"id": "SOC2"}]
+        first = app.get_mappers()
+        self.assertIs(app.get_mappers(), first)
+
+        # A reload with the same contents keeps the mappers
+        mock_load_frameworks.return_value = [{"id": "SOC2"}]
+        self.assertIs(app.get_mappers(), first)
+        mock_mapper_factory.create_all_mappers.assert_called_once_with([{"id": "SOC2"}])
+
+        mock_load_frameworks.return_value = [{"id": "SOC2"}, {"id": "NIST800-53"}]
+        app.get_mappers()
+        mock_mapper_factory.create_all_mappers.assert_called_with(
+            [{"id": "SOC2"}, {"id": "NIST800-53"}]
+        )
+        self.assertEqual(mock_mapper_factory.create_all_mappers.call_count, 2)
+
+    @patch("app.generate_csv", return_value="csv report")
+    @patch("app.analyze_findings")
+    @patch("app.map_report_findings")
+    @patch("app.get_mappers")
+    @patch("app.get_findings")
+    def test_lambda_handler_csv_output(
+        self,
+        mock_get_findings,
+        mock_get_mappers,
+        mock_map_report_findings,
+        mock_analyze_findings,
+        mock_generate_csv,
+    ):
+        """Test that CSV output is built alongside the analysis from one mapping."""
+        findings_dict = {"SOC2": self.sample_findings, "NIST800-53": []}
+        mock_get_findings.return_value = findings_dict
+        mock_map_report_findings.return_value = (
+            self.sample_findings,
+            {"SOC2": ["report"], "NIST800-53": ["report"]},
+            {"SOC2": ["analysis"], "NIST800-53": []},
+        )
+        mock_analyze_findings.return_value = ({"SOC2": "analysis"}, {"SOC2": {}})
+
+        result = app.lambda_handler({"output_format": "csv"}, {})
+
+        self.assertEqual(result["statusCode"], 200)
+        self.assertEqual(result["body"]["output"], "csv report")
+        self.assertEqual(result["body"]["stats"], {"SOC2": {}})
+        mappers = mock_get_mappers.return_value
+        mock_map_report_findings.assert_called_once_with(findings_dict, mappers)
+        mock_analyze_findings.assert_called_once_with(
+            findings_dict, mappers, {"SOC2": ["analysis"], "NIST800-53": []}
+        )
+        mock_generate_csv.assert_called_once_with(
+            self.sample_findings,
+            mappers,
+            {"SOC2": ["report"], "NIST800-53": ["report"]},
+        )
+
+    @patch("app.get_mappers")
+    @patch("app.get_findings")
+    def test_cli_handler_writes_gzip_report(self, mock_get_findings, mock_get_mappers):
+        """Test that a .gz output path gets a gzip-compressed CSV report."""
+        mock_get_findings.return_value = self.sample_findings
+        mapper = MagicMock()
+        mapper.get_control_id_attribute.return_value = "SOC2Controls"
+        mapper.map_finding.return_value = {
+            "Title": "IAM root user access key should not exist",
+            "Severity": "MEDIUM",
+            "Type": "Software and Configuration Checks",
+            "SOC2Controls": ["CC6.1"],
+        }
+        mock_get_mappers.return_value = {"SOC2": mapper}
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_file = os.path.join(tmp_dir, "report.csv.gz")
+            argv = ["app.py", "--output", output_file, "--no-email"]
+            with patch("sys.argv", argv), patch("builtins.print"):
+                app.cli_handler()
+
+            with gzip.open(output_file, "rt", encoding="utf-8") as f:
+                report = f.read()
+
+        self.assertIn("AWS SecurityHub SOC2 Compliance Report", report)
+        self.assertIn("IAM root user access key should not exist,MEDIUM", report)
+
     @patch("app.boto3.client")
     def test_send_test_email(self, mock_boto3_client):
         """Test sending a test email."""
@@ -1,5 +1,7 @@
 """Tests for email-related functions in app.py."""
 
+import email
+import email.policy
 import json
 import os
 import unittest
@@ -176,6 +178,135 @@ class TestAppEmail(unittest.TestCase):
         # Verify the function returned False
         self.assertFalse(result)
 
+    @patch("app.boto3.client")
+    def test_send_test_email_raw_message(self, mock_boto3_client):
+        """Test that the test email is sent as a single-part plain text message."""
+        # Create a mock SES client
+        mock_ses = MagicMock()
+        mock_boto3_client.return_value = mock_ses
+        mock_ses.send_raw_email.return_value = {"MessageId": "12345"}
+
+        # Set environment variables for testing
+        os.environ["SENDER_EMAIL"] = "sender@example.com"
+
+        self.assertTrue(app.send_test_email("test@example.com"))
+
+        # Verify the raw message is bytes that parse back to a text/plain email
+        raw = mock_ses.send_raw_email.call_args.kwargs["RawMessage"]["Data"]
+        self.assertIsInstance(raw, bytes)
+        msg = email.message_from_bytes(raw, policy=email.policy.default)
+        self.assertEqual(msg.get_content_type(), "text/plain")
+        self.assertEqual(msg["To"], "test@example.com")
+        self.assertIn("SES configuration is working", msg.get_content())
+
+    @patch("app.boto3.client")
+    def test_send_emails_multiple_recipients(self, mock_boto3_client):
+        """Test sending the report to several recipients with one SES client."""
+        # Create a mock SES client
+        mock_ses = MagicMock()
+        mock_boto3_client.return_value = mock_ses
+        mock_ses.send_raw_email.return_value = {"MessageId": "12345"}
+
+        # Set environment variables for testing
+        os.environ["SENDER_EMAIL"] = "sender@example.com"
+
+        recipients = ["a@example.com", "b@example.com", "c@example.com"]
+        result = app.send_emails(
+            recipients,
+            {"SOC2": self.sample_findings},
+            {"SOC2": "Sample analysis"},
+            {"SOC2": self.sample_stats},
+            MagicMock(),
+        )
+
+        # Verify every recipient got a message through the shared client
+        self.assertEqual(result, {recipient: True for recipient in recipients})
+        mock_boto3_client.assert_called_once()
+        self.assertEqual(mock_ses.send_raw_email.call_count, 3)
+        destinations = sorted(
+            call.kwargs["Destinations"][0]
+            for call in mock_ses.send_raw_email.call_args_list
+        )
+        self.assertEqual(destinations, recipients)
+
+    @patch("app.ThreadPoolExecutor")
+    @patch("app.send_email", return_value=True)
+    def test_send_emails_single_recipient_inline(self, mock_send_email, mock_executor):
+        """Test that a single recipient is sent without a thread pool."""
+        result = app.send_emails(["a@example.com"], {}, {}, {}, MagicMock())
+
+        self.assertEqual(result, {"a@example.com": True})
+        mock_send_email.assert_called_once()
+        mock_executor.assert_not_called()
+
+    @patch("app.send_email", return_value=True)
+    @patch("app.build_email_body", return_value="report body")
+    def test_send_emails_builds_body_once(self, mock_build_email_body, mock_send_email):
+        """Test that the email body is built once and shared by every recipient."""
+        recipients = ["a@example.com", "b@example.com", "c@example.com"]
+
+        app.send_emails(recipients, {}, {}, {}, MagicMock())
+
+        mock_build_email_body.assert_called_once_with({}, {}, {})
+        self.assertEqual(mock_send_email.call_count, 3)
+        for call in mock_send_email.call_args_list:
+            self.assertEqual(call.args[-1], "report body")
+
+    @patch("app.send_email")
+    @patch("app.build_email_body", side_effect=KeyError("total"))
+    def test_send_emails_body_error(self, mock_build_email_body, mock_send_email):
+        """Test that a failure building the body is reported for each recipient."""
+        recipients = ["a@example.com", "b@example.com"]
+
+        result = app.send_emails(recipients, {}, {}, {}, MagicMock())
+
+        self.assertEqual(result, {recipient: False for recipient in recipients})
+        mock_send_email.assert_not_called()
+
+    def test_build_email_body_severity_counts(self):
+        """Test that the body reports the severity counts from analyze_findings."""
+        stats = {
+            "SOC2": {
+                "total": 3,
+                "by_severity": {"critical": 1, "high": 2, "medium": 0, "low": 0},
+            }
+        }
+
+        body = app.build_email_body(
+            {"SOC2": self.sample_findings}, {"SOC2": "Sample analysis"}, stats
+        )
+
+        self.assertIn("Total findings: 3\nCritical: 1\nHigh: 2\n", body)
+        self.assertIn("Sample analysis", body)
+
+    def test_build_email_body_skips_frameworks_without_stats(self):
+        """Test that frameworks with findings but no stats are left out of the body."""
+        stats = {"SOC2": {"total": 1, "by_severity": {"high": 1}}}
+
+        body = app.build_email_body(
+            {"SOC2": self.sample_findings, "NIST800-53": self.sample_findings},
+            {"SOC2": "Sample analysis"},
+            stats,
+        )
+
+        self.assertIn("SOC2 Framework Summary", body)
+        self.assertNotIn("NIST800-53", body)
+
+    def test_parse_recipients(self):
+        """Test normalizing recipients from a string or a list."""
+        self.assertEqual(
+            app.parse_recipients("a@example.com, b@example.com,,a@example.com"),
+            ["a@example.com", "b@example.com"],
+        )
+        self.assertEqual(
+            app.parse_recipients([" b@example.com", "", "b@example.com", None]),
+            ["b@example.com"],
+        )
+
+    def test_send_emails_no_recipients(self):
+        """Test sending the report with no recipients."""
+        self.assertEqual(app.send_emails([], {}, {}, {}, MagicMock()), {})
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,10 +1,20 @@
-import json
+import itertools
 from datetime import datetime, timezone
 from unittest.mock import MagicMock, patch
 
 import pytest
 
-from app import analyze_findings, generate_csv, get_findings
+from app import (
+    BEDROCK_SYSTEM_PROMPT,
+    _analysis_cache,
+    analyze_findings,
+    generate_csv,
+    get_findings,
+    iter_findings,
+    map_report_findings,
+    read_bedrock_stream,
+    write_csv,
+)
 
 
 class TestAppFindings:
@@ -81,13 +91,29 @@ class TestAppFindings:
         }
         mapper2.get_control_id_attribute.return_value = "NIST800-53Controls"
 
+        for mapper in (mapper1, mapper2):
+            mapper.map_findings.side_effect = lambda findings, m=mapper: [
+                m.map_finding(finding) for finding in findings
+            ]
+
         return {"SOC2": mapper1, "NIST800-53": mapper2}
 
+    @staticmethod
+    def bedrock_stream(*texts):
+        """Build a Bedrock Converse response stream carrying the given text."""
+        return {
+            "stream": [
+                {"contentBlockDelta": {"delta": {"text": text}, "contentBlockIndex": 0}}
+                for text in texts
+            ]
+        }
+
     def test_get_findings_success(
         self, mock_securityhub, sample_findings, sample_frameworks
     ):
         # Setup mock responses
-        mock_securityhub.get_findings.return_value = sample_findings
+        paginator = mock_securityhub.get_paginator.return_value
+        paginator.paginate.side_effect = lambda **kwargs: iter([sample_findings])
 
         with patch("app.load_frameworks", return_value=sample_frameworks):
             # Test getting all findings
@@ -101,6 +127,43 @@ class TestAppFindings:
             assert isinstance(soc2_findings, list)
             assert len(soc2_findings) == len(sample_findings["Findings"])
 
+    def test_get_findings_filters_server_side(
+        self, mock_securityhub, sample_frameworks
+    ):
+        paginator = mock_securityhub.get_paginator.return_value
+        paginator.paginate.return_value = iter([])
+
+        with patch("app.load_frameworks", return_value=sample_frameworks):
+            get_findings(24)
+
+        filters = paginator.paginate.call_args.kwargs["Filters"]
+        assert filters["RecordState"] == [{"Value": "ACTIVE", "Comparison": "EQUALS"}]
+        assert filters["WorkflowStatus"] == [
+            {"Value": "NEW", "Comparison": "EQUALS"},
+            {"Value": "NOTIFIED", "Comparison": "EQUALS"},
+        ]
+
+    def test_iter_findings_uses_paginator(self, mock_securityhub):
+        pages = iter(
+            [
+                {"Findings": [{"Id": "finding1"}]},
+                {"Findings": [{"Id": "finding2"}]},
+            ]
+        )
+        paginator = mock_securityhub.get_paginator.return_value
+        paginator.paginate.return_value = pages
+
+        findings = iter_findings(mock_securityhub, {"RecordState": []})
+
+        # Pages are only consumed as the caller consumes findings
+        assert next(findings) == {"Id": "finding1"}
+        assert next(pages) == {"Findings": [{"Id": "finding2"}]}
+        assert list(findings) == []
+        mock_securityhub.get_paginator.assert_called_once_with("get_findings")
+        paginator.paginate.assert_called_once_with(
+            Filters={"RecordState": []}, PaginationConfig={"PageSize": 100}
+        )
+
     def test_get_findings_invalid_framework(self, mock_securityhub, sample_frameworks):
         with patch("app.load_frameworks", return_value=sample_frameworks):
             result = get_findings(24, framework_id="INVALID")
@@ -108,7 +171,8 @@ class TestAppFindings:
 
     def test_get_findings_api_error(self, mock_securityhub, sample_frameworks):
         # Setup mock to raise an exception
-        mock_securityhub.get_findings.side_effect = Exception("API Error")
+        paginator = mock_securityhub.get_paginator.return_value
+        paginator.paginate.side_effect = Exception("API Error")
 
         with patch("app.load_frameworks", return_value=sample_frameworks):
             result = get_findings(24)
@@ -132,6 +196,37 @@ class TestAppFindings:
             # assert "total" in stats["SOC2"]
             # assert "critical" in stats["SOC2"]
 
+    def test_analyze_findings_counts_label_severities(self, sample_findings):
+        # Mappers that copy the finding keep Severity as {"Label": ...}
+        mapper = MagicMock()
+        mapper.map_finding.side_effect = lambda finding: dict(
+            finding, NISTControls=["SC-28"]
+        )
+        mapper.map_findings.side_effect = lambda findings: [
+            mapper.map_finding(finding) for finding in findings
+        ]
+        mapper.get_control_id_attribute.return_value = "NISTControls"
+
+        with patch("app.get_ai_analyses", return_value={}):
+            analyses, stats = analyze_findings(
+                {"NIST": sample_findings["Findings"]}, {"NIST": mapper}
+            )
+
+        assert stats["NIST"]["by_severity"]["high"] == 1
+        assert stats["NIST"]["by_severity"]["medium"] == 1
+        assert analyses["NIST"] == (
+            "Analysis for NIST Framework:\n\n"
+            "Total findings: 2\n"
+            "Findings by severity:\n"
+            "  CRITICAL: 0\n  HIGH: 1\n  MEDIUM: 1\n  LOW: 0\n  INFORMATIONAL: 0\n"
+            "\nFindings by control:\n"
+            "  SC-28: 2 finding(s)\n"
+        )
+        assert (
+            generate_csv(sample_findings["Findings"], {"NIST": mapper}).count(",HIGH,")
+            == 1
+        )
+
     def test_analyze_findings_empty(self, sample_mappers):
         with patch("app.load_frameworks", return_value=[]):
             result = analyze_findings([], sample_mappers)
@@ -140,6 +235,236 @@ class TestAppFindings:
             assert isinstance(result[0], dict)
             assert isinstance(result[1], dict)
 
+    def test_analyze_findings_sends_compact_prompt(
+        self, mock_securityhub, sample_findings, sample_mappers
+    ):
+        # The patched boto3 client stands in for bedrock-runtime here
+        mock_securityhub.converse_stream.return_value = self.bedrock_stream("o", "k")
+
+        analyses, _ = analyze_findings(
+            {"SOC2": sample_findings["Findings"]}, {"SOC2": sample_mappers["SOC2"]}
+        )
+
+        body = mock_securityhub.converse_stream.call_args.kwargs
+        assert (
+            '"SOC2Controls":["CC1.1","CC1.2"]'
+            in body["messages"][0]["content"][0]["text"]
+        )
+        assert "\n  " not in body["messages"][0]["content"][0]["text"]
+        assert analyses["SOC2"].endswith("AI-Enhanced Analysis:\nok")
+
+    def test_analyze_findings_prompt_omits_descriptions(
+        self, mock_securityhub, sample_findings, sample_mappers
+    ):
+        mock_securityhub.converse_stream.return_value = self.bedrock_stream("ok")
+        mapper = sample_mappers["SOC2"]
+        mapper.map_finding.return_value = dict(
+            mapper.map_finding.return_value,
+            Description="This AWS control checks whether encryption is enabled.",
+        )
+
+        analyze_findings({"SOC2": sample_findings["Findings"]}, {"SOC2": mapper})
+
+        body = mock_securityhub.converse_stream.call_args.kwargs
+        assert (
+            "This AWS control checks" not in body["messages"][0]["content"][0]["text"]
+        )
+        assert (
+            '"Title":"S3 bucket should have encryption enabled"'
+            in body["messages"][0]["content"][0]["text"]
+        )
+
+    def test_analyze_findings_system_prompt(
+        self, mock_securityhub, sample_findings, sample_mappers
+    ):
+        invoke = mock_securityhub.converse_stream
+        invoke.side_effect = lambda **kwargs: self.bedrock_stream("ok")
+        findings = {"SOC2": sample_findings["Findings"]}
+        mappers = {"SOC2": sample_mappers["SOC2"]}
+
+        analyze_findings(findings, mappers)
+        body = invoke.call_args.kwargs
+        assert body["system"] == [{"text": BEDROCK_SYSTEM_PROMPT}]
+        assert body["messages"][0]["content"][0]["text"].startswith("### SOC2\n")
+
+        _analysis_cache.clear()
+        with patch("app.BEDROCK_PROMPT_CACHING", True):
+            analyze_findings(findings, mappers)
+        body = invoke.call_args.kwargs
+        assert body["system"][1] == {"cachePoint": {"type": "default"}}
+
+    def test_analyze_findings_skips_bedrock_below_min_severity(
+        self, mock_securityhub, sample_findings, sample_mappers
+    ):
+        invoke = mock_securityhub.converse_stream
+        invoke.side_effect = lambda **kwargs: self.bedrock_stream("ok")
+        mapper = sample_mappers["SOC2"]
+        mapper.map_finding.return_value = dict(
+            mapper.map_finding.return_value, Severity="MEDIUM"
+        )
+        findings = {"SOC2": sample_findings["Findings"]}
+
+        with patch("app.BEDROCK_MIN_SEVERITY", "HIGH"):
+            analyses, stats = analyze_findings(findings, {"SOC2": mapper})
+        invoke.assert_not_called()
+        assert "AI-Enhanced Analysis" not in analyses["SOC2"]
+        assert stats["SOC2"]["by_severity"]["medium"] == len(findings["SOC2"])
+
+        with patch("app.BEDROCK_MIN_SEVERITY", "MEDIUM"):
+            analyses, _ = analyze_findings(findings, {"SOC2": mapper})
+        invoke.assert_called_once()
+        assert analyses["SOC2"].endswith("AI-Enhanced Analysis:\nok")
+
+    def test_analyze_findings_skips_bedrock_without_high_findings(
+        self, mock_securityhub, sample_findings, sample_mappers
+    ):
+        invoke = mock_securityhub.converse_stream
+        invoke.side_effect = lambda **kwargs: self.bedrock_stream("ok")
+        mapper = sample_mappers["SOC2"]
+        mapped = mapper.map_finding.return_value
+        severities = itertools.cycle(["MEDIUM", "LOW"])
+        mapper.map_finding.side_effect = lambda finding: dict(
+            mapped, Severity=next(severities)
+        )
+        findings = {"SOC2": sample_findings["Findings"]}
+
+        with patch("app.BEDROCK_MIN_SEVERITY", "HIGH"):
+            analyses, stats = analyze_findings(findings, {"SOC2": mapper})
+        invoke.assert_not_called()
+        assert "AI-Enhanced Analysis" not in analyses["SOC2"]
+        assert analyses["SOC2"].endswith(
+            "\nNo findings at or above HIGH severity; AI analysis skipped.\n"
+        )
+        assert stats["SOC2"]["by_severity"]["critical"] == 0
+        assert stats["SOC2"]["by_severity"]["high"] == 0
+
+        # Lowering the threshold brings the same findings into the request
+        with patch("app.BEDROCK_MIN_SEVERITY", "LOW"):
+            analyses, _ = analyze_findings(findings, {"SOC2": mapper})
+        invoke.assert_called_once()
+        assert "AI analysis skipped" not in analyses["SOC2"]
+        assert analyses["SOC2"].endswith("AI-Enhanced Analysis:\nok")
+
+    def test_read_bedrock_stream(self):
+        stream = self.bedrock_stream("Key ", "risks", ".")["stream"]
+        # Events without text, including usage metadata, are skipped
+        stream.insert(0, {"messageStart": {"role": "assistant"}})
+        stream.append({"messageStop": {"stopReason": "end_turn"}})
+        usage = {"inputTokens": 10, "cacheReadInputTokens": 1024}
+        stream.append({"metadata": {"usage": usage, "metrics": {"latencyMs": 5}}})
+
+        assert read_bedrock_stream(stream) == "Key risks."
+
+    def test_analyze_findings_latency_optimized(
+        self, mock_securityhub, sample_findings, sample_mappers
+    ):
+        mock_securityhub.converse_stream.return_value = self.bedrock_stream("o", "k")
+        findings = {"SOC2": sample_findings["Findings"]}
+        mappers = {"SOC2": sample_mappers["SOC2"]}
+
+        analyze_findings(findings, mappers)
+        assert (
+            "performanceConfig" not in mock_securityhub.converse_stream.call_args.kwargs
+        )
+
+        # Drop the cached analysis so the second request reaches Bedrock
+        _analysis_cache.clear()
+        with patch("app.BEDROCK_LATENCY", "optimized"):
+            analyze_findings(findings, mappers)
+        assert mock_securityhub.converse_stream.call_args.kwargs[
+            "performanceConfig"
+        ] == {"latency": "optimized"}
+
+    def test_analyze_findings_single_bedrock_call(
+        self, mock_securityhub, sample_findings, sample_mappers
+    ):
+        ai_text = "### SOC2\nSOC2 is fine.\n\n### NIST800-53\nNIST needs work."
+        mock_securityhub.converse_stream.return_value = self.bedrock_stream(
+            ai_text[:20], ai_text[20:]
+        )
+        findings = sample_findings["Findings"]
+
+        analyses, _ = analyze_findings(
+            {"SOC2": findings, "NIST800-53": findings}, sample_mappers
+        )
+
+        mock_securityhub.converse_stream.assert_called_once()
+        body = mock_securityhub.converse_stream.call_args.kwargs
+        assert "### SOC2\n" in body["messages"][0]["content"][0]["text"]
+        assert "### NIST800-53\n" in body["messages"][0]["content"][0]["text"]
+        assert analyses["SOC2"].endswith("AI-Enhanced Analysis:\nSOC2 is fine.")
+        assert analyses["NIST800-53"].endswith(
+            "AI-Enhanced Analysis:\nNIST needs work."
+        )
+
+    def test_analyze_findings_keeps_model_headings(
+        self, mock_securityhub, sample_findings, sample_mappers
+    ):
+        ai_text = (
+            "### SOC2\nSOC2 is fine.\n### Recommendations\nRotate keys.\n\n"
+            "### NIST800-53\nNIST needs work."
+        )
+        mock_securityhub.converse_stream.return_value = self.bedrock_stream(ai_text)
+        findings = sample_findings["Findings"]
+
+        analyses, _ = analyze_findings(
+            {"SOC2": findings, "NIST800-53": findings}, sample_mappers
+        )
+
+        # Only the framework markers split the response
+        assert analyses["SOC2"].endswith(
+            "SOC2 is fine.\n### Recommendations\nRotate keys."
+        )
+        assert analyses["NIST800-53"].endswith("NIST needs work.")
+
+        # A lone framework keeps its headings and loses only its marker
+        _analysis_cache.clear()
+        mock_securityhub.converse_stream.return_value = self.bedrock_stream(
+            "### SOC2\nSOC2 is fine.\n### Recommendations\nRotate keys."
+        )
+        analyses, _ = analyze_findings(
+            {"SOC2": findings}, {"SOC2": sample_mappers["SOC2"]}
+        )
+        assert analyses["SOC2"].endswith(
+            "AI-Enhanced Analysis:\nSOC2 is fine.\n### Recommendations\nRotate keys."
+        )
+
+    def test_analyze_findings_reuses_cached_analysis(
+        self, mock_securityhub, sample_findings, sample_mappers
+    ):
+        invoke = mock_securityhub.converse_stream
+        invoke.side_effect = lambda **kwargs: self.bedrock_stream("ok")
+        findings = {"SOC2": sample_findings["Findings"]}
+        mappers = {"SOC2": sample_mappers["SOC2"]}
+
+        first, _ = analyze_findings(findings, mappers)
+        second, _ = analyze_findings(findings, mappers)
+        assert invoke.call_count == 1
+        assert second == first
+
+        # Different findings make a different request
+        analyze_findings({"SOC2": findings["SOC2"][:1]}, mappers)
+        assert invoke.call_count == 2
+
+        # Expired entries are not reused
+        with patch("app.BEDROCK_CACHE_TTL", 0):
+            analyze_findings(findings, mappers)
+        assert invoke.call_count == 3
+
+    def test_analyze_findings_does_not_cache_failures(
+        self, mock_securityhub, sample_findings, sample_mappers
+    ):
+        invoke = mock_securityhub.converse_stream
+        invoke.side_effect = [Exception("throttled"), self.bedrock_stream("ok")]
+        findings = {"SOC2": sample_findings["Findings"]}
+        mappers = {"SOC2": sample_mappers["SOC2"]}
+
+        analyze_findings(findings, mappers)
+        analyses, _ = analyze_findings(findings, mappers)
+
+        assert invoke.call_count == 2
+        assert analyses["SOC2"].endswith("AI-Enhanced Analysis:\nok")
+
     def test_generate_csv_success(self, sample_findings, sample_mappers):
         findings = sample_findings["Findings"]
 
@@ -155,3 +480,80 @@ class TestAppFindings:
             result = generate_csv([], sample_mappers)
             assert isinstance(result, str)
             assert result == ""
+
+    def test_generate_csv_quotes_fields_with_commas(self, sample_findings):
+        mapper = MagicMock()
+        mapper.map_finding.return_value = {
+            "SOC2Controls": ["CC6.1", "CC6.7"],
+            "Title": "S3 bucket, with public access",
+            "Severity": "HIGH",
+            "Type": "Effects/Data Exposure",
+        }
+        mapper.get_control_id_attribute.return_value = "SOC2Controls"
+
+        csv_content = generate_csv(sample_findings["Findings"], {"SOC2": mapper})
+
+        assert '"S3 bucket, with public access",HIGH,' in csv_content
+        assert '"CC6.1,CC6.7"' in csv_content
+
+    def test_map_report_findings(self, sample_findings, sample_mappers):
+        first, second = sample_findings["Findings"]
+        for framework_id, mapper in sample_mappers.items():
+            mapper.map_finding.side_effect = lambda finding, fid=framework_id: {
+                "Title": finding["Title"],
+                f"{fid}Controls": [f"{fid}-{finding['Id']}"],
+            }
+        findings = {"SOC2": [first], "NIST800-53": [second, first]}
+
+        all_findings, report_mapped, analysis_mapped = map_report_findings(
+            findings, sample_mappers
+        )
+
+        # Each mapper maps the flattened findings once, for the CSV report
+        assert all_findings == [first, second, first]
+        for framework_id, mapper in sample_mappers.items():
+            mapper.map_findings.assert_called_once_with(all_findings)
+            assert report_mapped[framework_id] == [
+                mapper.map_finding(finding) for finding in all_findings
+            ]
+        # The analysis gets each framework's own findings, in order
+        assert analysis_mapped == {
+            "SOC2": [sample_mappers["SOC2"].map_finding(first)],
+            "NIST800-53": [
+                sample_mappers["NIST800-53"].map_finding(finding)
+                for finding in (second, first)
+            ],
+        }
+
+        # The CSV is the same as one built from unmapped findings
+        def without_timestamps(content):
+            return [line for line in content.splitlines() if "Generated on" not in line]
+
+        assert without_timestamps(
+            generate_csv(all_findings, sample_mappers, report_mapped)
+        ) == without_timestamps(generate_csv(all_findings, sample_mappers))
+
+    def test_map_report_findings_list(self, sample_findings, sample_mappers):
+        findings = sample_findings["Findings"]
+
+        all_findings, report_mapped, analysis_mapped = map_report_findings(
+            findings, sample_mappers
+        )
+
+        assert all_findings is findings
+        assert report_mapped is analysis_mapped
+        assert set(report_mapped) == {"SOC2", "NIST800-53"}
+
+    def test_write_csv_streams_to_file(self, tmp_path, sample_findings, sample_mappers):
+        report = tmp_path / "report.csv"
+
+        with open(report, "w", newline="") as f:
+            write_csv(sample_findings["Findings"], sample_mappers, f)
+
+        content = report.read_text()
+        expected = generate_csv(sample_findings["Findings"], sample_mappers)
+        # Compare everything but the "Generated on" timestamps
+        assert [
+            line for line in content.splitlines() if "Generated on" not in line
+        ] == [line for line in expected.splitlines() if "Generated on" not in line]
+        assert "Title,Severity,Finding Type,NIST800-53 Controls" in content
@@ -0,0 +1,208 @@
+"""Tests for the FrameworkMapper base class."""
+
+import unittest
+from unittest.mock import patch
+
+from framework_mapper import FrameworkMapper
+
+
+class TestFrameworkMapper(unittest.TestCase):
+    """Tests for the FrameworkMapper base class."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.sample_mappings = {
+            "type_mappings": {
+                "Software and Configuration Checks": ["CM-6"],
+                "Effects/Data Exposure": ["SC-28"],
+            },
+            "title_mappings": {
+                "encryption": ["SC-13", "SC-28"],
+                "security group": ["SC-7"],
+                "key": ["SC-12"],
+            },
+            "control_descriptions": {},
+        }
+
+    def create_mapper(self, mappings=None):
+        """Create a mapper backed by the given mappings instead of a file."""
+        with patch.object(
+            FrameworkMapper,
+            "_load_mappings",
+            return_value=mappings or self.sample_mappings,
+        ):
+            return FrameworkMapper("TEST")
+
+    def test_map_to_controls_by_type_and_title(self):
+        """Test mapping on both finding type and title keywords."""
+        mapper = self.create_mapper()
+
+        controls = mapper._map_to_controls(
+            "Software and Configuration Checks/AWS Security Best Practices",
+            "S3 bucket Encryption should be enabled",
+            "",
+        )
+
+        self.assertEqual(controls, ["CM-6", "SC-13", "SC-28"])
+
+    def test_map_to_controls_by_type_without_automaton(self):
+        """Test the substring fallback used when pyahocorasick is not installed."""
+        with patch("framework_mapper.ahocorasick", None):
+            mapper = self.create_mapper()
+
+        self.assertIsNone(mapper._type_automaton)
+        self.assertEqual(
+            mapper._map_to_controls(
+                "Software and Configuration Checks/Effects/Data Exposure", "", ""
+            ),
+            ["CM-6", "SC-28"],
+        )
+
+    def test_map_to_controls_by_type_with_automaton(self):
+        """Test type matching through the Aho-Corasick automaton."""
+        mapper = self.create_mapper()
+
+        self.assertIsNotNone(mapper._type_automaton)
+        self.assertEqual(
+            mapper._map_to_controls(
+                "Software and Configuration Checks/Effects/Data Exposure", "", ""
+            ),
+            ["CM-6", "SC-28"],
+        )
+
+    def test_map_to_controls_matches_whole_words_only(self):
+        """Test that title keywords only match on word boundaries."""
+        mapper = self.create_mapper()
+
+        # "keys" and "monkey" must not match the "key" keyword
+        self.assertEqual(mapper._map_to_controls("Other", "Rotate monkeys", ""), [])
+        self.assertEqual(
+            mapper._map_to_controls("Other", "Unused KMS key", ""), ["SC-12"]
+        )
+        self.assertEqual(
+            mapper._map_to_controls("Other", "Security group allows SSH", ""),
+            ["SC-7"],
+        )
+
+    def test_map_to_controls_overlapping_keywords(self):
+        """Test that keywords overlapping at the same position all match."""
+        mappings = {
+            "type_mappings": {},
+            "title_mappings": {
+                "security": ["CA-7"],
+                "security group": ["SC-7"],
+                "group": ["AC-2"],
+            },
+        }
+        mapper = self.create_mapper(mappings)
+
+        self.assertEqual(
+            mapper._map_to_controls("Other", "Open security group", ""),
+            ["AC-2", "CA-7", "SC-7"],
+        )
+        self.assertEqual(
+            mapper._map_to_controls("Other", "Security posture", ""), ["CA-7"]
+        )
+
+    def test_map_to_controls_mixed_case_keywords(self):
+        """Test that keywords are matched case-insensitively from either side."""
+        mappings = {
+            "type_mappings": {},
+            "title_mappings": {"MFA": ["IA-2"], "Root Account": ["AC-6"]},
+        }
+        mapper = self.create_mapper(mappings)
+
+        self.assertEqual(
+            mapper._map_to_controls("Other", "Enable mfa for the ROOT account", ""),
+            ["AC-6", "IA-2"],
+        )
+
+    def test_map_finding(self):
+        """Test mapping a full finding."""
+        mapper = self.create_mapper()
+        finding = {
+            "Id": "finding-1",
+            "Types": ["Effects/Data Exposure"],
+            "Title": "Volume encryption disabled",
+            "Severity": {"Label": "HIGH", "Normalized": 70},
+            "Resources": [{"Id": "vol-123", "Details": {"Size": 8}}],
+        }
+
+        mapped_finding = mapper.map_finding(finding)
+
+        self.assertEqual(
+            mapped_finding,
+            {
+                "Title": "Volume encryption disabled",
+                "Description": "",
+                "Severity": "HIGH",
+                "Type": "Effects/Data Exposure",
+                "ResourceId": "vol-123",
+                "TESTControls": ["SC-13", "SC-28"],
+            },
+        )
+
+    def test_map_findings(self):
+        """Test mapping a batch of findings, keeping their order."""
+        mapper = self.create_mapper()
+        findings = [
+            {"Types": ["Effects/Data Exposure"], "Title": "Unused KMS key"},
+            {"Types": ["Other"], "Title": "Security group allows SSH"},
+        ]
+
+        self.assertEqual(
+            mapper.map_findings(findings),
+            [mapper.map_finding(finding) for finding in findings],
+        )
+        self.assertEqual(mapper.map_findings([]), [])
+
+    def test_map_to_controls_is_memoized(self):
+        """Test that findings from the same check are matched only once."""
+        mapper = self.create_mapper()
+
+        with patch.object(
+            mapper, "_match_controls", wraps=mapper._match_controls
+        ) as mock_match:
+            first = mapper._map_to_controls("Other", "Unused KMS key", "")
+            second = mapper._map_to_controls("Other", "Unused KMS key", "")
+            mapper._map_to_controls("Other", "Security group allows SSH", "")
+
+        self.assertEqual(first, ["SC-12"])
+        self.assertEqual(second, first)
+        self.assertIsNot(second, first)
+        self.assertEqual(mock_match.call_count, 2)
+
+    def test_controls_cache_is_bounded(self):
+        """Test that the controls cache is reset once it reaches its size limit."""
+        mapper = self.create_mapper()
+
+        with patch("framework_mapper.CONTROLS_CACHE_MAX_ENTRIES", 2):
+            for title in ("Unused KMS key", "Open security group", "Other"):
+                mapper._map_to_controls("Other", title, "")
+
+        self.assertEqual(len(mapper._controls_cache), 1)
+
+    def test_default_control_resolved_once(self):
+        """Test that the default control is looked up once, at construction."""
+        with patch.object(
+            FrameworkMapper, "_get_default_control", return_value="CA-7"
+        ) as mock_default:
+            mapper = self.create_mapper()
+
+            self.assertEqual(
+                mapper._map_to_controls("Other", "Unrelated", ""), ["CA-7"]
+            )
+            self.assertEqual(
+                mapper._map_to_controls("Other", "Unrelated", ""), ["CA-7"]
+            )
+            mock_default.assert_called_once()
+
+    def test_mappings_without_sections(self):
+        """Test that mappings missing type or title sections still map."""
+        mapper = self.create_mapper({"control_descriptions": {}})
+
+        self.assertEqual(mapper._map_to_controls("Effects", "Anything", ""), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
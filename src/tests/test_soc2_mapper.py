@@ -78,13 +78,37 @@ class TestSOC2Mapper(unittest.TestCase):
         }
 
     @patch("builtins.open", new_callable=mock_open, read_data=json.dumps({}))
+    @patch("os.path.getmtime", return_value=1700000000.0)
     @patch("os.path.exists", return_value=True)
-    def test_load_mappings_from_file(self, mock_exists, mock_file):
+    def test_load_mappings_from_file(self, mock_exists, mock_getmtime, mock_file):
         """Test loading mappings from a file."""
         mapper = SOC2Mapper(mappings_file="fake_path.json")
         mock_exists.assert_called_once_with("fake_path.json")
         mock_file.assert_called_once_with("fake_path.json", "r")
 
+    @patch("builtins.open", new_callable=mock_open)
+    @patch("os.path.getmtime", return_value=1700000000.0)
+    @patch("os.path.exists", return_value=True)
+    def test_load_mappings_shared_between_mappers(
+        self, mock_exists, mock_getmtime, mock_file
+    ):
+        """Test that mappers built from an unchanged file share its compiled mappings."""
+        mock_file.side_effect = lambda *args: mock_open(
+            read_data=json.dumps(self.sample_mappings)
+        )()
+
+        first = SOC2Mapper(mappings_file="shared.json")
+        second = SOC2Mapper(mappings_file="shared.json")
+        self.assertIs(first.mappings, second.mappings)
+        self.assertIs(first._title_keyword_controls, second._title_keyword_controls)
+        mock_file.assert_called_once_with("shared.json", "r")
+
+        # An edited file is reloaded
+        mock_getmtime.return_value += 1
+        third = SOC2Mapper(mappings_file="shared.json")
+        self.assertIsNot(third.mappings, first.mappings)
+        self.assertEqual(mock_file.call_count, 2)
+
     @patch("os.path.exists", return_value=False)
     def test_load_default_mappings_when_file_not_found(self, mock_exists):
         """Test loading default mappings when file is not found."""
@@ -123,6 +147,60 @@ class TestSOC2Mapper(unittest.TestCase):
         for control in expected_controls:
             self.assertIn(control, mapped_finding["SOC2Controls"])
 
+    @patch.object(SOC2Mapper, "_load_mappings")
+    def test_map_finding_type_controls_without_automaton(self, mock_load_mappings):
+        """Test that type mappings match the same with or without pyahocorasick."""
+        mock_load_mappings.return_value = self.sample_mappings
+        with_index = SOC2Mapper().map_finding(self.sample_finding)
+
+        with patch("framework_mapper.ahocorasick", None):
+            mapper = SOC2Mapper()
+        self.assertIsNone(mapper._type_automaton)
+
+        self.assertEqual(mapper.map_finding(self.sample_finding), with_index)
+
+    @patch.object(SOC2Mapper, "_load_mappings")
+    def test_map_finding_title_keywords_in_description(self, mock_load_mappings):
+        """Test that title keywords match in the description but not across fields."""
+        mock_load_mappings.return_value = {
+            "type_mappings": {},
+            "title_mappings": {"access key": ["CC6.3"], "backup": ["A1.2"]},
+        }
+        mapper = SOC2Mapper()
+
+        self.assertEqual(
+            mapper._map_to_controls("Other", "Root user", "An ACCESS KEY exists"),
+            ["CC6.3"],
+        )
+        # "access" ends the title and "key" starts the description
+        self.assertEqual(
+            mapper._map_to_controls("Other", "Root user access", "key exists"),
+            ["CC6.1"],
+        )
+
+    @patch.object(SOC2Mapper, "_load_mappings")
+    def test_map_finding_overlapping_title_keywords(self, mock_load_mappings):
+        """Test that keywords nested in or overlapping other keywords all match."""
+        mock_load_mappings.return_value = {
+            "type_mappings": {},
+            "title_mappings": {
+                "security": ["CC2.2"],
+                "Security Group": ["CC6.6"],
+                "group": ["CC6.3"],
+                "key": ["CC6.7"],
+            },
+        }
+        mapper = SOC2Mapper()
+
+        self.assertEqual(
+            mapper._map_to_controls("Other", "Open security group", ""),
+            ["CC2.2", "CC6.3", "CC6.6"],
+        )
+        self.assertEqual(
+            mapper._map_to_controls("Other", "Monkeys", "in a group"),
+            ["CC6.3", "CC6.7"],
+        )
+
     @patch.object(SOC2Mapper, "_load_mappings")
     def test_map_finding_with_no_matching_controls(self, mock_load_mappings):
         """Test mapping a finding with no matching controls."""
@@ -2,16 +2,24 @@
 
 import unittest
 from datetime import datetime, timezone
+from unittest.mock import patch
 
+import orjson
+
+import utils
 from soc2_mapper import SOC2Mapper
 from utils import (
+    RateLimiter,
     format_datetime,
     format_severity,
     get_account_id,
+    get_env_number,
     get_region,
     get_resource_id,
     group_by_control,
     group_by_severity,
+    json_dumps,
+    json_loads,
     truncate_text,
 )
 
@@ -139,6 +147,43 @@ class TestUtils(unittest.TestCase):
         truncated = truncate_text(None)
         self.assertEqual(truncated, "")
 
+    def test_json_helpers(self):
+        """Test compact JSON round-trips with and without orjson."""
+        data = {"Title": "S3 bucket", "Controls": ["CC6.1", "CC6.7"], "Count": 2}
+
+        self.assertIs(utils.orjson, orjson)
+        for backend in (orjson, None):
+            with self.subTest(orjson=backend), patch("utils.orjson", backend):
+                encoded = json_dumps(data)
+                self.assertEqual(
+                    encoded,
+                    '{"Title":"S3 bucket","Controls":["CC6.1","CC6.7"],"Count":2}',
+                )
+                self.assertEqual(json_loads(encoded), data)
+                self.assertEqual(json_loads(encoded.encode("utf-8")), data)
+
+    def test_get_env_number(self):
+        """Test reading numeric settings from the environment."""
+        with patch.dict("os.environ", {"TEST_TTL": "60", "TEST_RATE": "2.5"}):
+            self.assertEqual(get_env_number("TEST_TTL", 300), 60)
+            self.assertEqual(get_env_number("TEST_RATE", 12.0, float), 2.5)
+        with patch.dict("os.environ", clear=True):
+            self.assertEqual(get_env_number("TEST_TTL", 300), 300)
+
+    def test_get_env_number_invalid(self):
+        """Test that invalid settings fall back to the default with a warning."""
+        for value in ("5m", "", "1.5", "nan"):
+            with self.subTest(value=value), patch.dict(
+                "os.environ", {"TEST_TTL": value}
+            ), self.assertLogs(level="WARNING") as logs:
+                self.assertEqual(get_env_number("TEST_TTL", 300), 300)
+            self.assertIn("TEST_TTL", logs.output[0])
+
+        with patch.dict("os.environ", {"TEST_RATE": "inf"}), self.assertLogs(
+            level="WARNING"
+        ):
+            self.assertEqual(get_env_number("TEST_RATE", 12.0, float), 12.0)
+
     def test_format_severity(self):
         """Test formatting severity for display."""
         # Test with a severity dict
@@ -226,6 +271,31 @@ class TestUtils(unittest.TestCase):
         self.assertEqual(len(grouped["CC7.1"]), 1)
         self.assertEqual(len(grouped["CC2.2"]), 1)
 
+    @patch("utils.time.sleep")
+    @patch("utils.time.monotonic")
+    def test_rate_limiter(self, mock_monotonic, mock_sleep):
+        """Test that the rate limiter only sleeps once the burst is used up."""
+        mock_monotonic.return_value = 100.0
+        limiter = RateLimiter(2)
+
+        # The first two calls fit in the bucket
+        limiter.acquire()
+        limiter.acquire()
+        mock_sleep.assert_not_called()
+
+        # The third call has to wait for one token to refill
+        limiter.acquire()
+        mock_sleep.assert_called_once_with(0.5)
+
+    @patch("utils.time.sleep")
+    def test_rate_limiter_unlimited(self, mock_sleep):
+        """Test that a rate of zero or less never delays a call."""
+        for rate in (0, -1):
+            limiter = RateLimiter(rate)
+            for _ in range(3):
+                limiter.acquire()
+        mock_sleep.assert_not_called()
+
 
 if __name__ == "__main__":
     unittest.main()